@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+'''
+This module checks many RML games in one run.
+Each game is parsed, verified, translated to ISPL and checked with MCMAS in a
+pool of worker processes, and one JSON record per game is written as soon as
+it is done, in JSON Lines format.
+'''
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import pyparsing as pp
+from parse import *
+from generate import *
+from mcmas import *
+from nash import *
+from explicit import *
+
+def find_rml_files(paths):
+    '''
+    Return the list of files in paths, with each directory replaced by the
+    sorted *.rml files it contains.
+    '''
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.rml"))))
+        else:
+            files.append(path)
+    return files
+
+def batch_ispl_file_name(file_path, directory):
+    '''
+    Return the path of the ISPL file generated for file_path in directory.
+    The name of file_path is followed by a hash of its relative path, so that
+    files with the same name in different directories do not collide.
+    '''
+    digest = hashlib.sha1(os.path.relpath(file_path)).hexdigest()[:12]
+    root, extension = os.path.splitext(ispl_file_name(file_path, directory))
+    return "{}-{}{}".format(root, digest, extension)
+
+class GameChecker(object):
+    '''
+    Check one RML file in a worker process and return its record.
+    A class instead of a closure, so that multiprocessing can pickle it.
+    '''
+    def __init__(self, args):
+        self.args = args
+
+    def __call__(self, file_path):
+        args = self.args
+        record = {"file": file_path, "modules": None, "ispl_file": None, "ispl_size": None,
+                  "verdict": None, "cached_verdict": False, "explicit_states": None, "timings": {}, "error": None}
+
+        try:
+            # inside the try, so that a cache directory that cannot be created is an error of this record
+            options = CheckOptions(args.parser, batch_ispl_file_name(file_path, args.ispl_dir), not args.no_mcmas,
+                                   executable=args.mcmas_executable, mcmas_options=args.mcmas_option,
+                                   timeout=args.mcmas_timeout, memory_limit=args.mcmas_memory_limit,
+                                   stop_after=mcmas_stop_after(args), verdict_cache=verdict_cache_from_args(args),
+                                   explicit_threshold=args.explicit_threshold)
+            with open(file_path, 'r') as f:
+                result = check_nash_equilibrium(f.read(), options)
+        except (pp.ParseException, IOError, OSError, subprocess.CalledProcessError, MCMASTimeout) as e:
+            record["error"] = "{}: {}".format(type(e).__name__, e)
+            return record
+        except Exception as e:
+            # such as the recursion limit on a deeply nested formula, still one record per game
+            record["error"] = "internal error: {}: {}".format(type(e).__name__, e)
+            return record
+
+        record.update(result.summary())
+        if options.mcmas and result.verdict is None:
+            record["error"] = "fail to recognize MCMAS result"
+
+        return record
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Check many RML games, writing one JSON record per game.")
+    argparser.add_argument("paths", nargs="+", help="RML files, or directories of *.rml files")
+    argparser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count(),
+                           help="the number of games checked at the same time")
+    argparser.add_argument("--output", help="the JSON Lines file to write, default to the standard output")
+    argparser.add_argument("--ispl-dir", default="./ispl", help="the directory of the generated ISPL files")
+    argparser.add_argument("--parser", choices=["pyparsing", "rd"], default="pyparsing",
+                           help="parse with the pyparsing grammar or the hand-written recursive-descent parser")
+    argparser.add_argument("--no-mcmas", action="store_true", help="only generate the ISPL files")
+    add_mcmas_arguments(argparser)
+    add_explicit_arguments(argparser)
+    args = argparser.parse_args()
+
+    files = find_rml_files(args.paths)
+    if not os.path.isdir(args.ispl_dir):
+        os.makedirs(args.ispl_dir)
+
+    if args.parser == "pyparsing":
+        get_RML_parser() # build the grammar once, before the workers are forked
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.time()
+    counts = {True: 0, False: 0, None: 0}
+    pool = multiprocessing.Pool(args.jobs)
+    try:
+        # records are written in the order the games finish
+        for record in pool.imap_unordered(GameChecker(args), files):
+            out.write(json.dumps(record, sort_keys=True) + "\n")
+            out.flush()
+            counts[record["verdict"]] += 1
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        if out is not sys.stdout:
+            out.close()
+
+    sys.stderr.write("Checked {} games in {:.1f} s with {} processes: {} TRUE, {} FALSE, {} without verdict.\n".format(
+        len(files), time.time() - start, args.jobs, counts[True], counts[False], counts[None]))
@@ -0,0 +1,83 @@
+import argparse
+import shutil
+import tempfile
+import unittest
+from batch import *
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_find_rml_files(self):
+        files = find_rml_files(["RML_examples", "game.txt"])
+        self.assertIn("RML_examples/casino.rml", files)
+        self.assertEqual(sorted(files[:-1]), files[:-1])
+        self.assertEqual("game.txt", files[-1])
+
+    def test_game_checker(self):
+        argparser = argparse.ArgumentParser()
+        add_mcmas_arguments(argparser)
+        add_explicit_arguments(argparser)
+        args = argparser.parse_args(["--no-verdict-cache"])
+        args.parser = "rd"
+        args.ispl_dir = self.directory
+        args.no_mcmas = True
+        checker = GameChecker(args)
+
+        record = checker("RML_examples/casino.rml")
+        self.assertIsNone(record["error"])
+        self.assertEqual(2, record["modules"])
+        self.assertEqual(batch_ispl_file_name("RML_examples/casino.rml", self.directory), record["ispl_file"])
+        self.assertEqual(os.path.getsize(record["ispl_file"]), record["ispl_size"])
+        self.assertEqual(["generate", "parse", "verify"], sorted(record["timings"]))
+
+        record = checker("RML_examples/toggle.rml")
+        self.assertTrue(record["error"].startswith("ParseException"))
+        self.assertIsNone(record["ispl_file"])
+
+    def test_batch_ispl_file_name(self):
+        name = batch_ispl_file_name("RML_examples/casino.rml", self.directory)
+        self.assertEqual(self.directory, os.path.dirname(name))
+        self.assertTrue(os.path.basename(name).startswith("casino-"))
+        self.assertTrue(name.endswith(".ispl"))
+        self.assertEqual(name, batch_ispl_file_name(os.path.abspath("RML_examples/casino.rml"), self.directory))
+        self.assertNotEqual(name, batch_ispl_file_name("other/casino.rml", self.directory))
+
+    def test_cache_error(self):
+        # a cache directory that cannot be created gives an error record
+        argparser = argparse.ArgumentParser()
+        add_mcmas_arguments(argparser)
+        add_explicit_arguments(argparser)
+        blocker = os.path.join(self.directory, "file")
+        open(blocker, "w").close()
+        args = argparser.parse_args(["--verdict-cache-dir", os.path.join(blocker, "cache")])
+        args.parser = "rd"
+        args.ispl_dir = self.directory
+        args.no_mcmas = False
+        record = GameChecker(args)("RML_examples/casino.rml")
+        self.assertTrue(record["error"].startswith("OSError"), record["error"])
+
+    def test_internal_error(self):
+        # parentheses nested deeper than the recursion limit
+        with open("RML_examples/peer_to_peer_communication.rml", "r") as f:
+            rml_text = f.read()
+        file_path = os.path.join(self.directory, "nested.rml")
+        with open(file_path, "w") as f:
+            f.write(rml_text.replace("update\n    [] True", "update\n    [] " + "(" * 1000 + "True" + ")" * 1000, 1))
+
+        argparser = argparse.ArgumentParser()
+        add_mcmas_arguments(argparser)
+        add_explicit_arguments(argparser)
+        args = argparser.parse_args(["--no-verdict-cache"])
+        args.parser = "rd"
+        args.ispl_dir = self.directory
+        args.no_mcmas = True
+        record = GameChecker(args)(file_path)
+        self.assertTrue(record["error"].startswith("internal error: RuntimeError"), record["error"])
+        self.assertEqual(file_path, record["file"])
+
+if __name__ == "__main__":
+    unittest.main()
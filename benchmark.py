@@ -0,0 +1,439 @@
+#!/usr/bin/env python
+'''
+This module benchmarks the hot paths of the tool.
+Run './benchmark.py -h' for the list of benchmarks.
+'''
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import StringIO
+import sys
+import tempfile
+import time
+import pyparsing as pp
+from parse import *
+from game import *
+from rd_parse import *
+from generate import *
+from stream_parse import *
+from mcmas import *
+from nash import *
+from explicit import *
+from synthetic import *
+
+def read_examples(paths):
+    '''
+    Read in and strip the comments of each RML file in paths.
+    Return a list of (file name, file content) tuples for the files the grammar accepts.
+    '''
+    examples = []
+    for path in paths:
+        with open(path, 'r') as f:
+            file_content = strip_comments(f.read())
+
+        try:
+            build_RML_parser().parseString(file_content)
+        except pp.ParseException:
+            print "Skipping {}: not accepted by the grammar.".format(path)
+            continue
+
+        examples.append((os.path.basename(path), file_content))
+
+    return examples
+
+def best_time(f, repeat):
+    '''
+    Return the best wall time of repeat calls to f, in seconds.
+    '''
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        f()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+def bench_grammar(args):
+    '''
+    Compare parsing each file with a freshly built grammar against parsing it
+    with the cached grammar of get_RML_parser().
+    '''
+    examples = read_examples(args.files or sorted(glob.glob("RML_examples/*.rml")))
+    get_RML_parser() # build the cached grammar outside of the measurement
+
+    print "{:<40} {:>12} {:>12} {:>12}".format("file", "build (ms)", "cached (ms)", "saved (ms)")
+    for name, file_content in examples:
+        build = best_time(lambda: build_RML_parser().parseString(file_content), args.repeat)
+        cached = best_time(lambda: get_RML_parser().parseString(file_content), args.repeat)
+        print "{:<40} {:>12.3f} {:>12.3f} {:>12.3f}".format(name, build * 1000, cached * 1000, (build - cached) * 1000)
+
+def bench_parsers(args):
+    '''
+    Compare the throughput of the pyparsing grammar and the recursive-descent
+    parser, both producing the game model used by verify.py and generate.py.
+    '''
+    examples = read_examples(args.files or sorted(glob.glob("RML_examples/*.rml")))
+    RML_file_parser = get_RML_parser()
+
+    print "{:<40} {:>10} {:>14} {:>14} {:>9}".format("file", "size (B)", "pyparsing (ms)", "rd (ms)", "speedup")
+    total_size = 0
+    total_pp = 0.0
+    total_rd = 0.0
+    for name, file_content in examples:
+        file_content = file_content * args.scale_modules
+        pp_time = best_time(lambda: convert_result(RML_file_parser.parseString(file_content)), args.repeat)
+        rd_time = best_time(lambda: parse_RML(file_content), args.repeat)
+        print "{:<40} {:>10} {:>14.3f} {:>14.3f} {:>8.1f}x".format(name, len(file_content), pp_time * 1000, rd_time * 1000, pp_time / rd_time)
+        total_size += len(file_content)
+        total_pp += pp_time
+        total_rd += rd_time
+
+    print "throughput: pyparsing {:.1f} KB/s, rd {:.1f} KB/s".format(total_size / 1024.0 / total_pp, total_size / 1024.0 / total_rd)
+
+def nested_goal(family, depth):
+    '''
+    Return a LTL goal nesting depth levels of the given family.
+    '''
+    s = "p"
+    for i in range(depth):
+        if family == "parentheses":
+            s = "(" + s + ")"
+        elif family == "temporal":
+            s = "G(F(" + s + ") && X(q))" if i % 2 else "(F(" + s + ") -> X(!q))"
+        else: # "until"
+            s = "((" + s + ") U (q || p))"
+    return s
+
+def nested_game(family, depth):
+    return "module m controls p, q\n" + \
+           "    init\n" + \
+           "    [] True ~> p := True, q := False\n" + \
+           "    update\n" + \
+           "    [] " + "!(" * depth + "p" + ")" * depth + " ~> p := q\n" + \
+           "    goal\n" + \
+           "    " + nested_goal(family, depth) + "\n" + \
+           "end module\n"
+
+def bench_packrat(args):
+    '''
+    Time the pyparsing grammar on deeply nested goals, first without and then
+    with packrat memoization (which cannot be turned off again).
+    '''
+    depths = range(args.step, args.max_depth + 1, args.step)
+    families = ["parentheses", "temporal", "until"]
+    RML_file_parser = get_RML_parser()
+
+    def measure():
+        times = {}
+        for family in families:
+            for depth in depths:
+                file_content = nested_game(family, depth)
+                times[(family, depth)] = best_time(lambda: RML_file_parser.parseString(file_content), args.repeat)
+        return times
+
+    plain = measure()
+    enable_packrat(args.cache_size)
+    packrat = measure()
+
+    print "{:<12} {:>6} {:>12} {:>12} {:>9}".format("family", "depth", "plain (ms)", "packrat (ms)", "speedup")
+    for family in families:
+        for depth in depths:
+            key = (family, depth)
+            print "{:<12} {:>6} {:>12.3f} {:>12.3f} {:>8.2f}x".format(family, depth, plain[key] * 1000, packrat[key] * 1000, plain[key] / packrat[key])
+
+    hits, misses = pp.ParserElement.packrat_cache_stats
+    print "packrat cache of {} entries, last parse: {} hits, {} misses".format(args.cache_size, hits, misses)
+
+def ring_game(modules):
+    '''
+    Return a game of the given number of modules, in which module i copies the
+    variable of module i - 1.
+    '''
+    return "".join("module m{0} controls x{0}, y{0}\n"
+                   "    init\n"
+                   "    [] True ~> x{0} := True, y{0} := False\n"
+                   "    [] True ~> x{0} := False, y{0} := False\n"
+                   "    update\n"
+                   "    [] x{1} && !y{0} ~> x{0} := x{1}, y{0} := (x{0} || y{0}) -> !x{1}\n"
+                   "    [] !x{1} || y{0} ~> y{0} := !y{0}\n"
+                   "    goal\n"
+                   "    GF(x{0} && !y{0}) || F(y{0} U x{1})\n"
+                   "end module\n".format(i, (i - 1) % modules) for i in range(modules))
+
+def bench_parallel(args):
+    '''
+    Time parsing a game with many modules in 1, 2, 4, ... processes.
+    '''
+    file_content = ring_game(args.modules)
+    jobs = [1]
+    while jobs[-1] * 2 <= args.max_jobs:
+        jobs.append(jobs[-1] * 2)
+
+    print "{} modules, {} KB, {} CPUs".format(args.modules, len(file_content) / 1024, multiprocessing.cpu_count())
+    print "{:<10} {:>6} {:>12} {:>9}".format("parser", "jobs", "time (s)", "speedup")
+    for parser in ["pyparsing", "rd"]:
+        serial = None
+        for n in jobs:
+            elapsed = best_time(lambda: list(iter_modules(StringIO.StringIO(file_content), parser, n, args.chunk_size)), args.repeat)
+            if serial is None:
+                serial = elapsed
+            print "{:<10} {:>6} {:>12.3f} {:>8.2f}x".format(parser, n, elapsed, serial / elapsed)
+
+def measure_game(task):
+    '''
+    Check a game with check_nash_equilibrium in a worker process, and return
+    its summary with the CPU time and the growth of the peak memory of the
+    worker. Each game gets a fresh worker, so that the peaks do not add up.
+    '''
+    rml_text, options = task
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_cpu = time.clock()
+    summary = check_nash_equilibrium(rml_text, options).summary()
+    summary["cpu_time"] = time.clock() - start_cpu
+    summary["max_rss_growth_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - start_rss
+    return summary
+
+def scaling_key(record):
+    return tuple(record[k] for k in ("family", "players", "commands", "variables", "goal_depth"))
+
+def bench_scaling(args):
+    '''
+    Run the whole tool on synthetic games of growing size, and write one JSON
+    record per game. With --baseline, compare against the records of an
+    earlier run and exit with status 1 on any regression.
+    '''
+    options = CheckOptions(parser=args.parser, mcmas=args.mcmas,
+                           timeout=args.mcmas_timeout, memory_limit=args.mcmas_memory_limit,
+                           stop_after=mcmas_stop_after(args), executable=args.mcmas_executable,
+                           mcmas_options=args.mcmas_option, explicit_threshold=args.explicit_threshold)
+    out = open(args.output, "w") if args.output else sys.stdout
+
+    records = []
+    for family in args.families:
+        for players in args.players:
+            rml_text = synthetic_game(family, players, args.commands, args.variables, args.goal_depth)
+            best = None
+            for i in range(args.repeat):
+                pool = multiprocessing.Pool(1)
+                try:
+                    summary = pool.apply(measure_game, [(rml_text, options)])
+                finally:
+                    pool.terminate()
+                    pool.join()
+                summary["total_time"] = sum(summary["timings"].values())
+                if best is None or summary["total_time"] < best["total_time"]:
+                    best = summary
+
+            best.update({"family": family, "players": players, "commands": args.commands,
+                         "variables": args.variables, "goal_depth": args.goal_depth,
+                         "rml_size": len(rml_text)})
+            records.append(best)
+            out.write(json.dumps(best, sort_keys=True) + "\n")
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = dict((scaling_key(r), r) for r in (json.loads(line) for line in f if line.strip()))
+
+        regressions = 0
+        for record in records:
+            old = baseline.get(scaling_key(record))
+            if old is None:
+                continue
+            problems = []
+            if record["total_time"] > old["total_time"] * (1 + args.tolerance) + 0.01:
+                problems.append("time {:.3f} s -> {:.3f} s".format(old["total_time"], record["total_time"]))
+            if record["max_rss_growth_kb"] > old["max_rss_growth_kb"] * (1 + args.tolerance) + 1024:
+                problems.append("memory {} KB -> {} KB".format(old["max_rss_growth_kb"], record["max_rss_growth_kb"]))
+            if record["ispl_size"] != old["ispl_size"]:
+                problems.append("ISPL size {} -> {}".format(old["ispl_size"], record["ispl_size"]))
+            if problems:
+                regressions += 1
+                sys.stderr.write("REGRESSION {} {} players: {}\n".format(record["family"], record["players"], ", ".join(problems)))
+
+        if regressions:
+            sys.exit(1)
+
+def bench_mcmas(args):
+    '''
+    Time checking ISPL files with MCMASRunner and the stand-in fake_mcmas.py,
+    for 1, 2, 4, ... concurrent runs, and with and without stopping at the
+    verdict.
+    '''
+    jobs = [1]
+    while jobs[-1] * 2 <= args.max_jobs:
+        jobs.append(jobs[-1] * 2)
+
+    os.environ["FAKE_MCMAS_DELAY"] = str(args.delay)
+    os.environ["FAKE_MCMAS_OUTPUT_SIZE"] = str(args.output_size)
+    executable = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_mcmas.py")
+
+    directory = tempfile.mkdtemp()
+    try:
+        rml_text = synthetic_game("casino", 2)
+        ispl = generate_ispl(parse_RML(rml_text), verbose=False)
+        files = []
+        for i in range(args.files):
+            files.append(os.path.join(directory, "game{}.ispl".format(i)))
+            with open(files[-1], "w") as f:
+                f.write(ispl)
+
+        print "{} ISPL files, {:.2f} s per check, {} bytes after the verdict".format(args.files, args.delay, args.output_size)
+        print "{:<14} {:>6} {:>10} {:>14}".format("stop_after", "jobs", "time (s)", "checks/s")
+        for stop_after in [None, 1]:
+            for n in jobs:
+                start = time.time()
+                runner = MCMASRunner(n, executable=executable, stop_after=stop_after)
+                for job in [runner.submit(path) for path in files]:
+                    job.wait()
+                runner.shutdown()
+                elapsed = time.time() - start
+                print "{:<14} {:>6} {:>10.3f} {:>14.1f}".format(stop_after, n, elapsed, args.files / elapsed)
+    finally:
+        shutil.rmtree(directory)
+
+def verdict_text(verdict):
+    return {True: "TRUE", False: "FALSE", None: "-"}[verdict]
+
+def bench_explicit(args):
+    '''
+    Time the explicit-state checker against MCMAS on each game, and compare
+    their verdicts. A TRUE explicit verdict must be the verdict of MCMAS; a
+    FALSE one may differ when a module needs memory to deviate. Exit with
+    status 1 if an explicit TRUE is a MCMAS FALSE.
+    '''
+    options = CheckOptions(parser="rd", executable=args.mcmas_executable,
+                           mcmas_options=args.mcmas_option, timeout=args.mcmas_timeout,
+                           memory_limit=args.mcmas_memory_limit, stop_after=mcmas_stop_after(args),
+                           explicit_threshold=0)
+
+    print "{:<40} {:>8} {:>9} {:>10} {:>9} {:>10}".format("file", "states", "explicit", "time (s)", "MCMAS", "time (s)")
+    wrong = 0
+    for path in args.files or sorted(glob.glob("RML_examples/*.rml")):
+        with open(path, 'r') as f:
+            rml_text = f.read()
+        try:
+            modules = parse_game(rml_text, "rd")
+            verify_result(modules)
+        except pp.ParseException:
+            print "Skipping {}: not a valid game.".format(path)
+            continue
+
+        start = time.time()
+        try:
+            verdict, states = check_explicit(modules, args.explicit_threshold, args.max_search)
+        except ExplicitUnsupported:
+            verdict, states = None, "-"
+        explicit_time = time.time() - start
+
+        result = check_nash_equilibrium(rml_text, options)
+        if verdict is True and result.verdict is False:
+            wrong += 1
+        print "{:<40} {:>8} {:>9} {:>10.3f} {:>9} {:>10.3f}".format(os.path.basename(path), states, verdict_text(verdict),
+                                                                    explicit_time, verdict_text(result.verdict),
+                                                                    result.timings["mcmas"])
+
+    if wrong:
+        sys.stderr.write("{} games with an explicit TRUE and a MCMAS FALSE\n".format(wrong))
+        sys.exit(1)
+
+def bench_comments(args):
+    '''
+    Time strip_comments on heavily commented RML text of growing size.
+    '''
+    with open("RML_examples/casino.rml", "r") as f:
+        lines = f.read().splitlines()
+    block = "".join(line + " # a trailing comment\n# a whole-line comment\n" for line in lines)
+
+    print "{:>12} {:>12} {:>12}".format("size (MB)", "time (s)", "MB/s")
+    size = args.start
+    while size <= args.stop:
+        file_content = block * (size * 1024 * 1024 / len(block) + 1)
+        elapsed = best_time(lambda: strip_comments(file_content), args.repeat)
+        mb = len(file_content) / (1024.0 * 1024.0)
+        print "{:>12.1f} {:>12.3f} {:>12.1f}".format(mb, elapsed, mb / elapsed)
+        size *= 2
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Benchmark the hot paths of the tool.")
+    subparsers = argparser.add_subparsers(title="benchmarks")
+
+    grammar_parser = subparsers.add_parser("grammar", help="per-file savings of the cached RML grammar")
+    grammar_parser.add_argument("files", nargs="*", help="RML files, default to RML_examples/*.rml")
+    grammar_parser.add_argument("--repeat", type=int, default=20)
+    grammar_parser.set_defaults(func=bench_grammar)
+
+    parsers_parser = subparsers.add_parser("parsers", help="throughput of the pyparsing grammar against the recursive-descent parser")
+    parsers_parser.add_argument("files", nargs="*", help="RML files, default to RML_examples/*.rml")
+    parsers_parser.add_argument("--repeat", type=int, default=5)
+    parsers_parser.add_argument("--scale-modules", type=int, default=1,
+                                help="repeat the modules of each file this many times (the result is not verified)")
+    parsers_parser.set_defaults(func=bench_parsers)
+
+    packrat_parser = subparsers.add_parser("packrat", help="the pyparsing grammar on deeply nested goals, with and without packrat")
+    packrat_parser.add_argument("--max-depth", type=int, default=12)
+    packrat_parser.add_argument("--step", type=int, default=2)
+    packrat_parser.add_argument("--cache-size", type=int, default=DEFAULT_PACKRAT_CACHE_SIZE)
+    packrat_parser.add_argument("--repeat", type=int, default=3)
+    packrat_parser.set_defaults(func=bench_packrat)
+
+    parallel_parser = subparsers.add_parser("parallel", help="parsing the modules of a large game in a pool of processes")
+    parallel_parser.add_argument("--modules", type=int, default=2000)
+    parallel_parser.add_argument("--max-jobs", type=int, default=16)
+    parallel_parser.add_argument("--chunk-size", type=int, default=DEFAULT_PARALLEL_CHUNK_SIZE)
+    parallel_parser.add_argument("--repeat", type=int, default=3)
+    parallel_parser.set_defaults(func=bench_parallel)
+
+    scaling_parser = subparsers.add_parser("scaling", help="the whole tool on synthetic games of growing size")
+    scaling_parser.add_argument("--families", type=lambda s: s.split(","), default=FAMILIES,
+                                help="comma-separated families of games, default to " + ",".join(FAMILIES))
+    scaling_parser.add_argument("--players", type=lambda s: [int(n) for n in s.split(",")], default=[1, 2, 3, 4, 5, 6],
+                                help="comma-separated numbers of players")
+    scaling_parser.add_argument("--commands", type=int, default=2, help="update commands per module")
+    scaling_parser.add_argument("--variables", type=int, default=0, help="extra controlled variables per module")
+    scaling_parser.add_argument("--goal-depth", type=int, default=2, help="temporal operators around each goal")
+    scaling_parser.add_argument("--parser", choices=["pyparsing", "rd"], default="pyparsing")
+    scaling_parser.add_argument("--mcmas", action="store_true", help="also check the games with MCMAS")
+    add_mcmas_arguments(scaling_parser)
+    add_explicit_arguments(scaling_parser)
+    scaling_parser.add_argument("--repeat", type=int, default=3)
+    scaling_parser.add_argument("--output", help="the JSON Lines file to write, default to the standard output")
+    scaling_parser.add_argument("--baseline", help="the JSON Lines output of an earlier run to compare with")
+    scaling_parser.add_argument("--tolerance", type=float, default=0.5,
+                                help="the relative increase of time or memory reported as a regression")
+    scaling_parser.set_defaults(func=bench_scaling)
+
+    mcmas_parser = subparsers.add_parser("mcmas", help="concurrent MCMAS runs, with the stand-in fake_mcmas.py")
+    mcmas_parser.add_argument("--files", type=int, default=32, help="the number of ISPL files to check")
+    mcmas_parser.add_argument("--max-jobs", type=int, default=16)
+    mcmas_parser.add_argument("--delay", type=float, default=0.1, help="the seconds each fake MCMAS run takes")
+    mcmas_parser.add_argument("--output-size", type=int, default=1024 * 1024,
+                              help="the bytes each fake MCMAS run prints after its verdict")
+    mcmas_parser.set_defaults(func=bench_mcmas)
+
+    explicit_parser = subparsers.add_parser("explicit", help="the explicit-state checker against MCMAS, verdicts and times")
+    explicit_parser.add_argument("files", nargs="*", help="RML files, default to RML_examples/*.rml")
+    explicit_parser.add_argument("--explicit-threshold", type=int, default=1024,
+                                 help="the maximum number of reachable states checked explicitly")
+    explicit_parser.add_argument("--max-search", type=int, default=DEFAULT_MAX_SEARCH,
+                                 help="the maximum number of search steps of the explicit-state checker")
+    add_mcmas_arguments(explicit_parser)
+    explicit_parser.set_defaults(func=bench_explicit)
+
+    comments_parser = subparsers.add_parser("comments", help="comment stripping throughput on growing inputs")
+    comments_parser.add_argument("--start", type=int, default=1, help="smallest input size in MB")
+    comments_parser.add_argument("--stop", type=int, default=128, help="largest input size in MB")
+    comments_parser.add_argument("--repeat", type=int, default=3)
+    comments_parser.set_defaults(func=bench_comments)
+
+    args = argparser.parse_args()
+    args.func(args)
@@ -0,0 +1,187 @@
+'''
+This module keeps results of the tool in a cache directory on disk, so that
+running it again on an unchanged RML file skips parsing, verification and
+ISPL generation, and checking an unchanged ISPL file skips MCMAS (see mcmas.py).
+Each entry is a pickle file named after its key, or a copy of a file, such as
+the ISPL file, which is never read in memory as a whole. The directory is kept under
+a maximum size by removing the least recently used entries, and entries not
+used for longer than a maximum age are removed as well.
+'''
+import cPickle as pickle
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from parse import *
+from game import *
+
+# Part of every key: change it whenever the parser, the game model or the
+# generated ISPL change, so that entries of older versions are not used.
+TOOL_VERSION = "1"
+
+DEFAULT_CACHE_SIZE = 100 * 1024 * 1024 # bytes
+
+def source_key(f):
+    '''
+    Return the hex digest of the RML file object f with comments removed,
+    together with TOOL_VERSION. The file is read line by line.
+    '''
+    h = hashlib.sha1(TOOL_VERSION + "\0")
+    for line in f:
+        h.update(strip_comments(line))
+    return h.hexdigest()
+
+class DiskCache(object):
+    '''
+    A directory of pickled values and files, at most max_size bytes large.
+    max_age: the number of seconds an entry is kept after its last use, or None
+    '''
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE, max_age=None):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".pickle")
+
+    def file_path(self, key):
+        return os.path.join(self.directory, key + ".file")
+
+    def expired(self, path):
+        '''
+        Remove the entry at path if it is older than max_age, and return whether it was.
+        Raise OSError if there is no entry at path.
+        '''
+        if self.max_age is not None and time.time() - os.path.getmtime(path) > self.max_age:
+            self.remove(path)
+            return True
+        return False
+
+    def touch(self, path):
+        '''
+        Mark the entry at path as recently used.
+        '''
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass # removed by another process in the meantime
+
+    def get(self, key):
+        '''
+        Return the value stored under key, or None.
+        '''
+        path = self.path(key)
+        try:
+            if self.expired(path):
+                return None
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception:
+            # an entry truncated or written by an incompatible version
+            self.remove(path)
+            return None
+
+        self.touch(path)
+        return value
+
+    def get_file(self, key, destination):
+        '''
+        Copy the file stored under key to the path destination, a block at a
+        time. Return False if there is no such entry.
+        '''
+        path = self.file_path(key)
+        try:
+            if self.expired(path):
+                return False
+            shutil.copyfile(path, destination)
+        except (IOError, OSError):
+            return False
+
+        self.touch(path)
+        return True
+
+    def set(self, key, value):
+        '''
+        Store value under key, then evict entries until the cache fits in max_size.
+        '''
+        # write to a temporary file first, so that readers never see half an entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(temp_path, self.path(key))
+
+        self.evict()
+
+    def set_file(self, key, source):
+        '''
+        Store a copy of the file at the path source under key, then evict
+        entries until the cache fits in max_size.
+        '''
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(source, temp_path)
+        os.rename(temp_path, self.file_path(key))
+
+        self.evict()
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass # removed by another process in the meantime
+
+    def evict(self):
+        '''
+        Remove the entries older than max_age, then the least recently used
+        entries until the cache fits in max_size.
+        '''
+        now = time.time()
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle") and not name.endswith(".file"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self.max_age is not None and now - st.st_mtime > self.max_age:
+                self.remove(path)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total_size += st.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self.remove(path)
+            total_size -= size
+
+def load_game(cache, key):
+    '''
+    Return the list of Module stored for the source key, or None.
+    '''
+    result = cache.get("game-" + key)
+    if result is not None:
+        result = [intern_module(m) for m in result]
+    return result
+
+def store_game(cache, key, result):
+    cache.set("game-" + key, result)
+
+def load_ispl(cache, key, ispl_file_name):
+    '''
+    Write the ISPL file stored for the source key to ispl_file_name, and
+    return whether there was one.
+    '''
+    return cache.get_file("ispl-" + key, ispl_file_name)
+
+def store_ispl(cache, key, ispl_file_name):
+    cache.set_file("ispl-" + key, ispl_file_name)
@@ -0,0 +1,83 @@
+import os
+import shutil
+import StringIO
+import tempfile
+import time
+import unittest
+from parse import *
+from game import *
+from rd_parse import *
+from cache import *
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_source_key(self):
+        key = source_key(StringIO.StringIO("module m # the module\ncontrols x\n"))
+        self.assertEqual(key, source_key(StringIO.StringIO("module m \ncontrols x# x\n")))
+        self.assertNotEqual(key, source_key(StringIO.StringIO("module m \ncontrols y\n")))
+
+    def test_game(self):
+        cache = DiskCache(self.directory)
+        with open("RML_examples/casino.rml", "r") as f:
+            result = parse_RML(f.read())
+
+        self.assertIsNone(load_game(cache, "k"))
+        store_game(cache, "k", result)
+        loaded = load_game(cache, "k")
+        self.assertEqual(repr(result), repr(loaded))
+        self.assertIs(result[0].name, loaded[0].name)
+
+        ispl_file_name = os.path.join(self.directory, "game.ispl")
+        copy_file_name = os.path.join(self.directory, "copy.ispl")
+        self.assertFalse(load_ispl(cache, "k", copy_file_name))
+        with open(ispl_file_name, "w") as f:
+            f.write("ISPL")
+        store_ispl(cache, "k", ispl_file_name)
+        self.assertTrue(load_ispl(cache, "k", copy_file_name))
+        with open(copy_file_name, "r") as f:
+            self.assertEqual("ISPL", f.read())
+        self.assertEqual(repr(result), repr(load_game(cache, "k")))
+
+    def test_evict_files(self):
+        cache = DiskCache(self.directory, max_size=1500)
+        source = os.path.join(self.directory, "source")
+        with open(source, "w") as f:
+            f.write("x" * 1000)
+        cache.set_file("a", source)
+        cache.set_file("b", source)
+        self.assertFalse(os.path.exists(cache.file_path("a")) and os.path.exists(cache.file_path("b")))
+        self.assertTrue(cache.get_file("b", os.path.join(self.directory, "copy")))
+
+    def test_corrupt_entry(self):
+        cache = DiskCache(self.directory)
+        with open(cache.path("k"), "wb") as f:
+            f.write("not a pickle")
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(os.path.exists(cache.path("k")))
+
+    def test_evict_least_recently_used(self):
+        cache = DiskCache(self.directory)
+        for key in ["a", "b", "c"]:
+            cache.set(key, "x" * 1000)
+        size = os.path.getsize(cache.path("a"))
+
+        # a is older than b and c, then used again
+        now = time.time()
+        for age, key in [(30, "a"), (20, "b"), (10, "c")]:
+            os.utime(cache.path(key), (now - age, now - age))
+        cache.get("a")
+
+        cache.max_size = 2 * size
+        cache.set("d", "x" * 1000)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual("x" * 1000, cache.get("a"))
+        self.assertEqual("x" * 1000, cache.get("d"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+'''
+This module keeps the tool running as a daemon, so that checking a game does
+not pay for starting Python, importing pyparsing and building the grammar.
+The daemon listens on a Unix domain socket. Each request is one line of JSON
+{"rml": <text of a RML file>, "options": {...}}, answered by one line of JSON
+with the summary of the CheckResult, or {"error": <message>}. A connection
+may send several requests one after the other.
+Requests are queued to a fixed pool of worker threads, which run the MCMAS
+processes. When the queue is full, requests are refused instead of waiting.
+'''
+import argparse
+import errno
+import json
+import os
+import Queue
+import signal
+import socket
+import SocketServer
+import stat
+import subprocess
+import sys
+import threading
+import pyparsing as pp
+from parse import *
+from mcmas import *
+from nash import *
+from explicit import *
+
+DEFAULT_SOCKET = "./nash.sock"
+DEFAULT_MAX_QUEUE = 64
+
+def is_integer(value):
+    # bool is a subclass of int, but true and false are not numbers in JSON
+    return isinstance(value, (int, long)) and not isinstance(value, bool)
+
+def is_number(value):
+    return is_integer(value) or isinstance(value, float)
+
+# The CheckOptions a request may set, with a test of their values
+REQUEST_OPTIONS = {
+    "parser": lambda value: value in ("pyparsing", "rd"),
+    "timeout": lambda value: value is None or (is_number(value) and value > 0),
+    "memory_limit": lambda value: value is None or (is_integer(value) and value > 0),
+    "stop_after": lambda value: value is None or (is_integer(value) and value > 0),
+    "explicit_threshold": lambda value: is_integer(value) and value >= 0,
+}
+
+class CheckRequest(object):
+    '''
+    A request waiting in the queue of the daemon, and then its reply.
+    '''
+    def __init__(self, rml_text, options):
+        self.rml_text = rml_text
+        self.options = options
+        self.reply = None
+        self.done = threading.Event()
+
+class CheckServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    '''
+    Read requests in one thread per connection and check them in a pool of
+    jobs worker threads, with at most max_queue requests waiting.
+    options: the CheckOptions the options of each request are applied to
+    '''
+    daemon_threads = True
+
+    def __init__(self, socket_path, options, jobs, max_queue=DEFAULT_MAX_QUEUE):
+        # build the grammar before the workers may use it, whatever the
+        # default parser, since a request may ask for pyparsing
+        get_RML_parser()
+        SocketServer.UnixStreamServer.__init__(self, socket_path, CheckHandler)
+        self.options = options
+        self.queue = Queue.Queue(max_queue)
+        self.workers = [threading.Thread(target=self.work) for i in range(jobs)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    def request_options(self, request_options):
+        options = CheckOptions()
+        options.__dict__.update(self.options.__dict__)
+        for name, value in request_options.items():
+            if name not in REQUEST_OPTIONS:
+                raise ValueError("unknown option: " + name)
+            if not REQUEST_OPTIONS[name](value):
+                raise ValueError("bad value of option {}: {}".format(name, json.dumps(value)))
+            if isinstance(value, unicode):
+                value = value.encode("utf-8")
+            setattr(options, name, value)
+        return options
+
+    def check(self, rml_text, request_options):
+        '''
+        Queue a request and wait for its reply.
+        '''
+        request = CheckRequest(rml_text, self.request_options(request_options))
+        try:
+            self.queue.put_nowait(request)
+        except Queue.Full:
+            return {"error": "busy: {} requests are already waiting".format(self.queue.maxsize)}
+
+        # Event.wait without a timeout cannot be interrupted by Ctrl-C in Python 2
+        while not request.done.wait(1):
+            pass
+        return request.reply
+
+    def work(self):
+        while True:
+            request = self.queue.get()
+            try:
+                request.reply = check_nash_equilibrium(request.rml_text, request.options).summary()
+                request.reply["error"] = None
+            except (pp.ParseException, OSError, subprocess.CalledProcessError, MCMASTimeout) as e:
+                request.reply = {"error": "{}: {}".format(type(e).__name__, e)}
+            except Exception as e:
+                # keep the worker alive for the next requests
+                request.reply = {"error": "internal error: {}: {}".format(type(e).__name__, e)}
+            request.done.set()
+
+class CheckHandler(SocketServer.StreamRequestHandler):
+    '''
+    Answer the requests of one connection.
+    '''
+    def handle(self):
+        for line in iter(self.rfile.readline, ""):
+            try:
+                request = json.loads(line)
+                # json gives unicode strings, the parsers work on byte strings
+                reply = self.server.check(request["rml"].encode("utf-8"), request.get("options", {}))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                reply = {"error": "bad request: {}".format(e)}
+
+            self.wfile.write(json.dumps(reply, sort_keys=True) + "\n")
+            self.wfile.flush()
+
+def request_check(socket_path, rml_text, options=None):
+    '''
+    Send one game to the daemon listening on socket_path and return its reply.
+    options: a dictionary of the CheckOptions in REQUEST_OPTIONS
+    '''
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+        f = s.makefile("rw")
+        f.write(json.dumps({"rml": rml_text, "options": options or {}}) + "\n")
+        f.flush()
+        reply = f.readline()
+        f.close()
+    finally:
+        s.close()
+
+    if not reply:
+        raise IOError("no reply from the daemon at " + socket_path)
+    return json.loads(reply)
+
+def remove_stale_socket(socket_path):
+    '''
+    Remove the socket left at socket_path by a daemon that did not stop
+    cleanly. Raise IOError if the path is not a socket, or if a daemon still
+    accepts connections on it.
+    '''
+    try:
+        mode = os.stat(socket_path).st_mode
+    except OSError as e:
+        if e.errno == errno.ENOENT:
+            return
+        raise
+    if not stat.S_ISSOCK(mode):
+        raise IOError("{} exists and is not a socket".format(socket_path))
+
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(socket_path)
+    except socket.error as e:
+        if e.errno != errno.ECONNREFUSED:
+            raise
+        os.remove(socket_path)
+        return
+    finally:
+        s.close()
+    raise IOError("a daemon is already listening on {}".format(socket_path))
+
+def serve(args):
+    '''
+    Run the daemon until it is interrupted.
+    '''
+    options = CheckOptions(parser=args.parser, executable=args.mcmas_executable, mcmas_options=args.mcmas_option,
+                           timeout=args.mcmas_timeout, memory_limit=args.mcmas_memory_limit,
+                           stop_after=mcmas_stop_after(args), verdict_cache=verdict_cache_from_args(args),
+                           explicit_threshold=args.explicit_threshold)
+
+    try:
+        remove_stale_socket(args.socket)
+    except (IOError, socket.error) as e:
+        sys.exit("Cannot listen on {}: {}".format(args.socket, e))
+    server = CheckServer(args.socket, options, args.jobs, args.max_queue)
+    print "Listening on {} with {} workers.".format(args.socket, args.jobs)
+    sys.stdout.flush()
+
+    # stop on SIGTERM as on Ctrl-C, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(args.socket)
+
+def check(args):
+    '''
+    Check each file with the daemon and print one JSON reply per file.
+    '''
+    for path in args.files:
+        with open(path, 'r') as f:
+            reply = request_check(args.socket, f.read(), {})
+        reply["file"] = path
+        print json.dumps(reply, sort_keys=True)
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="Check RML games in a long-running process.")
+    subparsers = argparser.add_subparsers(title="commands")
+
+    serve_parser = subparsers.add_parser("serve", help="run the daemon")
+    serve_parser.add_argument("--socket", default=DEFAULT_SOCKET, help="the path of the Unix domain socket")
+    serve_parser.add_argument("--jobs", type=int, default=4, help="the number of games checked at the same time")
+    serve_parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                              help="the number of requests that may wait for a worker")
+    serve_parser.add_argument("--parser", choices=["pyparsing", "rd"], default="rd",
+                              help="the parser used unless a request says otherwise")
+    add_mcmas_arguments(serve_parser)
+    add_explicit_arguments(serve_parser)
+    serve_parser.set_defaults(func=serve)
+
+    check_parser = subparsers.add_parser("check", help="check RML files with a running daemon")
+    check_parser.add_argument("files", nargs="+")
+    check_parser.add_argument("--socket", default=DEFAULT_SOCKET, help="the path of the Unix domain socket")
+    check_parser.set_defaults(func=check)
+
+    args = argparser.parse_args()
+    args.func(args)
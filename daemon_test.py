@@ -0,0 +1,76 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+from nash import *
+from daemon import *
+from fake_mcmas import write_stand_in
+
+class TestDaemon(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        executable = write_stand_in(os.path.join(self.directory, "mcmas"), "--verdict", "true")
+
+        self.socket_path = os.path.join(self.directory, "nash.sock")
+        self.server = CheckServer(self.socket_path, CheckOptions(parser="rd", executable=executable), 2)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+        with open("RML_examples/casino.rml", "r") as f:
+            self.rml_text = f.read()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_check(self):
+        with open("RML_examples/peer_to_peer_communication.rml", "r") as f:
+            peer_to_peer = f.read()
+        for rml_text, options, explicit_states in [(self.rml_text, {}, 16),
+                                                   (self.rml_text, {"parser": "pyparsing", "explicit_threshold": 0}, None),
+                                                   (peer_to_peer, {}, 4),
+                                                   (peer_to_peer, {"explicit_threshold": 0}, None)]:
+            reply = request_check(self.socket_path, rml_text, options)
+            self.assertIsNone(reply["error"])
+            self.assertIs(True, reply["verdict"])
+            self.assertEqual(2, reply["modules"])
+            self.assertEqual(explicit_states, reply["explicit_states"])
+
+    def test_errors(self):
+        reply = request_check(self.socket_path, self.rml_text.replace(":=", "="))
+        self.assertTrue(reply["error"].startswith("ParseException"))
+        reply = request_check(self.socket_path, self.rml_text, {"executable": "/bin/rm"})
+        self.assertIn("unknown option", reply["error"])
+        for options in [{"parser": "yacc"}, {"timeout": "1"}, {"timeout": -1}, {"memory_limit": 1.5},
+                        {"stop_after": 0}, {"stop_after": True}, {"explicit_threshold": None}]:
+            reply = request_check(self.socket_path, self.rml_text, options)
+            self.assertIn("bad value of option", reply["error"])
+        # the connection and the workers are still usable
+        self.assertIs(True, request_check(self.socket_path, self.rml_text, {"timeout": 60})["verdict"])
+
+    def test_remove_stale_socket(self):
+        # a daemon is listening
+        self.assertRaises(IOError, remove_stale_socket, self.socket_path)
+        self.assertTrue(os.path.exists(self.socket_path))
+
+        # not a socket
+        path = os.path.join(self.directory, "file")
+        open(path, "w").close()
+        self.assertRaises(IOError, remove_stale_socket, path)
+        self.assertTrue(os.path.exists(path))
+
+        # a socket nobody listens on
+        path = os.path.join(self.directory, "stale.sock")
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(path)
+        s.close()
+        remove_stale_socket(path)
+        self.assertFalse(os.path.exists(path))
+        remove_stale_socket(path)
+
+if __name__ == "__main__":
+    unittest.main()
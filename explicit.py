@@ -0,0 +1,595 @@
+'''
+This module decides whether a small game has a Nash Equilibrium by itself,
+on the explicit state space of the game, without writing an ISPL file or
+running MCMAS.
+
+The game is the one of the ISPL file. A state is a value of every controlled
+variable, and of its copy in the Environment, which the modules read the
+variables of other modules from. The initial states are the combinations of
+one init command per module, with the copies equal to the variables. At each
+step every module takes one of its enabled update commands, or keeps its
+variables when it has none. The Environment updates the copies from the copies
+only when every module takes an update command, so the copies of a module may
+lag behind its variables.
+
+As in the formula of the ISPL file, the game has a Nash Equilibrium if from
+every initial state there is a profile of memoryless strategies, one update
+command per module and state, under which every module either achieves its
+goal, or cannot achieve it by deviating. Deviations may use memory: a module
+can deviate if some path on which the other modules follow their strategies
+satisfies its goal, which is an accepting cycle of the product of the game
+with the tableau of the goal. A memoryless deviation is a memoryful one, so a
+TRUE verdict is also the verdict of MCMAS-SLK, whose deviations are memoryless,
+but a FALSE verdict may come from a deviation needing memory. Callers only
+trust a TRUE, and leave a FALSE to MCMAS.
+
+The profiles are searched lazily, for each set of modules that may win: the
+strategies are only fixed on the states that an outcome where the winners do
+not all achieve their goals, or a deviation of a module that loses, goes
+through, until the winners achieve their goals and no module that loses can
+deviate whatever the other choices are. A check takes at most max_search
+steps through the products, and leaves the game to MCMAS past them.
+'''
+import itertools
+from formula import *
+
+DEFAULT_EXPLICIT_THRESHOLD = 64 # reachable states checked before MCMAS, 0 to always use MCMAS
+DEFAULT_MAX_SEARCH = 300000 # search steps of one check, see SearchBudget
+
+class ExplicitUnsupported(Exception):
+    '''
+    Raised when a game is beyond the explicit-state checker, which then leaves
+    it to MCMAS: more reachable states than the threshold, a longer search
+    than max_search, or an init command not assigning constants.
+    '''
+    pass
+
+class SearchBudget(object):
+    '''
+    The number of steps a check may still take: transitions of the products
+    of the game with the goal automata, and partial sets of sub-formulas
+    enumerated to find them.
+    '''
+    def __init__(self, steps):
+        self.limit = steps
+        self.steps = steps
+
+    def spend(self, steps):
+        self.steps -= steps
+        if self.steps < 0:
+            raise ExplicitUnsupported("no verdict after {} search steps".format(self.limit))
+
+def add_explicit_arguments(argparser):
+    '''
+    Add the option of the explicit-state checker to an argparse parser.
+    '''
+    argparser.add_argument("--explicit-threshold", type=int, default=DEFAULT_EXPLICIT_THRESHOLD,
+                           help="first check games with at most this many reachable states explicitly, and only run "
+                                "MCMAS unless they have a Nash Equilibrium; 0 to always use MCMAS")
+
+def compile_formula(tree, index):
+    '''
+    Return a function of a state, a tuple of booleans, computing the
+    propositional formula tree.
+    index: a dict mapping each variable to its position in the state
+    '''
+    if isinstance(tree, Constant):
+        value = tree.value == "True"
+        return lambda state: value
+    elif isinstance(tree, Variable):
+        i = index[tree.name]
+        return lambda state: state[i]
+    elif isinstance(tree, UnaryOp) and tree.op == "!":
+        operand = compile_formula(tree.operand, index)
+        return lambda state: not operand(state)
+    elif isinstance(tree, BinaryOp) and tree.op != "U":
+        left = compile_formula(tree.left, index)
+        right = compile_formula(tree.right, index)
+        if tree.op == "&&":
+            return lambda state: left(state) and right(state)
+        elif tree.op == "||":
+            return lambda state: left(state) or right(state)
+        else:
+            return lambda state: not left(state) or right(state)
+    else:
+        raise ExplicitUnsupported("temporal operator " + tree.op + " in a guarded command")
+
+class ExplicitGame(object):
+    '''
+    The reachable state space of a game. A state is a tuple of the values
+    of the variables, followed by the values of their Environment copies.
+    '''
+    def __init__(self, modules, max_states=None):
+        '''
+        modules: a list of Module, verified
+        max_states: raise ExplicitUnsupported if more states are reachable
+        '''
+        self.modules = modules
+        self.variables = [v for m in modules for v in m.variables]
+        self.index = dict((v, i) for i, v in enumerate(self.variables)) # the positions of the variables
+        copy_index = dict((v, i + len(self.variables)) for i, v in enumerate(self.variables))
+
+        # for each module, a list of (condition, [(variable position, value), ...]) per update command,
+        # reading its own variables and the copies of the others, as its agent in the ISPL file
+        self.commands = []
+        # for each module, a list of [(copy position, value), ...] per update command, as in the Environment
+        self.copy_commands = []
+        for m in modules:
+            own_variables = set(m.variables)
+            index = dict((v, self.index[v] if v in own_variables else copy_index[v]) for v in self.variables)
+            self.commands.append([(compile_formula(gc.condition, index),
+                                   [(self.index[a.variable], compile_formula(a.formula, index)) for a in gc.actions])
+                                  for gc in m.update])
+            self.copy_commands.append([[(copy_index[a.variable], compile_formula(a.formula, copy_index)) for a in gc.actions]
+                                       for gc in m.update])
+
+        self.choice_cache = {} # state -> the choices of each module
+        self.successor_cache = {} # (state, joint choice) -> state
+        self.initial = self.initial_states()
+        self.states = self.reachable_states(max_states)
+
+    def initial_states(self):
+        '''
+        Return the list of initial states, one per combination of init commands.
+        Variables an init command does not assign start False, and the copies
+        start equal to the variables, as in the ISPL file.
+        '''
+        per_module = []
+        for m in self.modules:
+            assignments = []
+            for gc in m.init:
+                values = dict((v, False) for v in m.variables)
+                for a in gc.actions:
+                    if not isinstance(a.formula, Constant):
+                        raise ExplicitUnsupported("init command of " + m.name + " assigning a formula to " + a.variable)
+                    values[a.variable] = a.formula.value == "True"
+                assignments.append([values[v] for v in m.variables])
+            per_module.append(assignments)
+
+        initial = []
+        for combination in itertools.product(*per_module):
+            state = tuple(value for values in combination for value in values) * 2
+            if state not in initial:
+                initial.append(state)
+        return initial
+
+    def choices(self, state):
+        '''
+        Return, for each module, the list of indices of its enabled update
+        commands in state, or [None] when it has to keep its variables, taking
+        the skip action of the ISPL file.
+        '''
+        if state not in self.choice_cache:
+            result = []
+            for commands in self.commands:
+                enabled = [k for k, (condition, actions) in enumerate(commands) if condition(state)]
+                result.append(enabled or [None])
+            self.choice_cache[state] = result
+        return self.choice_cache[state]
+
+    def successor(self, state, joint):
+        '''
+        Return the state after each module takes its choice in joint. The
+        copies only change when no module keeps its variables, since the
+        Environment has no Evolution line for a skip.
+        '''
+        key = (state, joint)
+        if key not in self.successor_cache:
+            values = list(state)
+            for commands, k in zip(self.commands, joint):
+                if k is not None:
+                    for i, value in commands[k][1]:
+                        values[i] = value(state)
+            if None not in joint:
+                for copy_commands, k in zip(self.copy_commands, joint):
+                    for i, value in copy_commands[k]:
+                        values[i] = value(state)
+            self.successor_cache[key] = tuple(values)
+        return self.successor_cache[key]
+
+    def successors(self, state, choices):
+        '''
+        Return the set of states after state, for the lists of choices of each module.
+        '''
+        return set(self.successor(state, joint) for joint in itertools.product(*choices))
+
+    def reachable_states(self, max_states=None):
+        '''
+        Return the list of states reachable from the initial states.
+        '''
+        states = list(self.initial)
+        seen = set(states)
+        i = 0
+        while i < len(states):
+            if max_states is not None and len(states) > max_states:
+                raise ExplicitUnsupported("more than {} reachable states".format(max_states))
+            state = states[i]
+            i += 1
+            for successor in self.successors(state, self.choices(state)):
+                if successor not in seen:
+                    seen.add(successor)
+                    states.append(successor)
+        if max_states is not None and len(states) > max_states:
+            raise ExplicitUnsupported("more than {} reachable states".format(max_states))
+        return states
+
+class GoalAutomaton(object):
+    '''
+    The tableau of a LTL goal. Its states are the sets of sub-formulas that may
+    hold together at a state of the game, each given by the truth value of
+    every sub-formula; a run has to fulfil each 'U' infinitely often.
+    F a is read as True U a, G a as !(True U !a), and a -> b as !a || b.
+    '''
+    def __init__(self, tree, index):
+        self.index = index
+        self.nodes = [] # (kind, first operand, second operand), operands before the formulas using them
+        self.node_ids = {}
+        self.root = self.add_tree(tree)
+
+        self.atoms = sorted(set(a for kind, a, b in self.nodes if kind == "var"))
+        self.temporal = [n for n, (kind, a, b) in enumerate(self.nodes) if kind in ("X", "U")]
+        self.untils = [n for n in self.temporal if self.nodes[n][0] == "U"]
+        self.label_cache = {} # values of the atoms -> the consistent sets of sub-formulas
+        self.transition_cache = {} # (set of sub-formulas, values of the atoms) -> the sets that may follow
+        self.requirement_cache = {} # (requirements on the next set, values of the atoms) -> the sets meeting them
+        self.steps = 0 # partial sets of sub-formulas enumerated so far
+
+    def add(self, kind, a=None, b=None):
+        key = (kind, a, b)
+        if key not in self.node_ids:
+            self.node_ids[key] = len(self.nodes)
+            self.nodes.append(key)
+        return self.node_ids[key]
+
+    def add_tree(self, tree):
+        if isinstance(tree, Constant):
+            true = self.add("true")
+            return true if tree.value == "True" else self.add("not", true)
+        elif isinstance(tree, Variable):
+            return self.add("var", self.index[tree.name])
+        elif isinstance(tree, UnaryOp):
+            operand = self.add_tree(tree.operand)
+            if tree.op == "!":
+                return self.add("not", operand)
+            elif tree.op == "X":
+                return self.add("X", operand)
+            elif tree.op == "F":
+                return self.add("U", self.add("true"), operand)
+            else:
+                return self.add("not", self.add("U", self.add("true"), self.add("not", operand)))
+        else:
+            left = self.add_tree(tree.left)
+            right = self.add_tree(tree.right)
+            if tree.op == "&&":
+                return self.add("and", left, right)
+            elif tree.op == "||":
+                return self.add("or", left, right)
+            elif tree.op == "->":
+                return self.add("or", self.add("not", left), right)
+            else:
+                return self.add("U", left, right)
+
+    def labels(self, state):
+        '''
+        Return the sets of sub-formulas consistent with state, each as a tuple
+        of the truth values of all sub-formulas.
+        '''
+        key = tuple(state[i] for i in self.atoms)
+        if key not in self.label_cache:
+            self.label_cache[key] = self.enumerate_labels(state, {})
+        return self.label_cache[key]
+
+    def next_labels(self, values, state):
+        '''
+        Return the sets of sub-formulas consistent with state that may follow
+        the set of sub-formulas values.
+        '''
+        key = (values, tuple(state[i] for i in self.atoms))
+        if key not in self.transition_cache:
+            required = {}
+            for n in self.temporal:
+                kind, a, b = self.nodes[n]
+                if kind == "X":
+                    required[a] = values[n]
+                elif values[n] and not values[b]:
+                    required[n] = True
+                elif not values[n] and values[a]:
+                    required[n] = False
+
+            # many sets of sub-formulas require the same of the next one
+            requirement = (tuple(sorted(required.items())), key[1])
+            if requirement not in self.requirement_cache:
+                self.requirement_cache[requirement] = self.enumerate_labels(state, required)
+            self.transition_cache[key] = self.requirement_cache[requirement]
+        return self.transition_cache[key]
+
+    def enumerate_labels(self, state, required):
+        '''
+        Return the sets of sub-formulas consistent with state in which the
+        sub-formulas in the dict required have the given truth values.
+        The sub-formulas are taken in order, branching on the truth of each X
+        and of each U whose operands do not decide it.
+        '''
+        labels = []
+        stack = [[]]
+        while stack:
+            values = stack.pop()
+            self.steps += 1
+            n = len(values)
+            if n == len(self.nodes):
+                labels.append(tuple(values))
+                continue
+
+            kind, a, b = self.nodes[n]
+            if kind == "true":
+                options = [True]
+            elif kind == "var":
+                options = [state[a]]
+            elif kind == "not":
+                options = [not values[a]]
+            elif kind == "and":
+                options = [values[a] and values[b]]
+            elif kind == "or":
+                options = [values[a] or values[b]]
+            elif kind == "U" and (values[b] or not values[a]):
+                options = [values[b]]
+            else:
+                options = [False, True]
+            for value in options:
+                if required.get(n, value) == value:
+                    stack.append(values + [value])
+        return labels
+
+    def fulfils(self, values, n):
+        '''
+        Whether a set of sub-formulas fulfils the 'U' sub-formula n.
+        '''
+        return not values[n] or values[self.nodes[n][2]]
+
+def strongly_connected_components(roots, successors):
+    '''
+    Yield the strongly connected components reachable from roots as lists of
+    nodes, with Tarjan's algorithm on an explicit stack.
+    '''
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    for root in roots:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, successor_iter = work[-1]
+            for successor in successor_iter:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(successors(successor))))
+                    break
+                elif successor in on_stack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        w = stack.pop()
+                        on_stack.discard(w)
+                        component.append(w)
+                        if w == node:
+                            break
+                    yield component
+
+def shortest_path(sources, is_target, successors, allowed=None):
+    '''
+    Return the shortest list of nodes from one of sources to a node for which
+    is_target holds, through nodes in allowed if given, or None.
+    '''
+    parents = dict((s, None) for s in sources)
+    queue = list(sources)
+    i = 0
+    while i < len(queue):
+        node = queue[i]
+        i += 1
+        if is_target(node):
+            path = []
+            while node is not None:
+                path.append(node)
+                node = parents[node]
+            return path[::-1]
+        for successor in successors(node):
+            if successor not in parents and (allowed is None or successor in allowed):
+                parents[successor] = node
+                queue.append(successor)
+    return None
+
+def find_run(automaton, start, successors, budget=None):
+    '''
+    Search for a path of the game from the state start that satisfies the goal
+    of automaton, following successors, a function returning the states after
+    a state.
+    budget: a SearchBudget spent by the transitions of the product explored, or None
+    Return the states of a lasso-shaped such path, or None if there is none.
+    '''
+    state_successors = {}
+    product_successors = {}
+
+    def next_nodes(node):
+        if node not in product_successors:
+            state, values = node
+            steps = automaton.steps
+            if state not in state_successors:
+                state_successors[state] = successors(state)
+            product_successors[node] = [(s, v) for s in state_successors[state] for v in automaton.next_labels(values, s)]
+            if budget is not None:
+                budget.spend(len(product_successors[node]) + automaton.steps - steps)
+        return product_successors[node]
+
+    roots = [(start, values) for values in automaton.labels(start) if values[automaton.root]]
+    for component in strongly_connected_components(roots, next_nodes):
+        nodes = set(component)
+        entry = component[0]
+        if len(component) == 1 and entry not in next_nodes(entry):
+            continue
+        if not all(any(automaton.fulfils(values, n) for state, values in component) for n in automaton.untils):
+            continue
+
+        # a path to the component, and a cycle through it fulfilling each 'U'
+        run = shortest_path(roots, lambda node: node == entry, next_nodes)
+        current = entry
+        for n in automaton.untils:
+            path = shortest_path([current], lambda node: automaton.fulfils(node[1], n), next_nodes, nodes)
+            run.extend(path[1:])
+            current = path[-1]
+        path = shortest_path([s for s in next_nodes(current) if s in nodes], lambda node: node == entry, next_nodes, nodes)
+        run.extend(path)
+        return [state for state, values in run]
+
+    return None
+
+def profile_successors(game, strategies, deviator, free):
+    '''
+    Return the successors function of the game in which the modules follow
+    strategies, a dict mapping (state, module index) to a choice, except the
+    deviator, if not None, which takes any choice. Where the strategies do
+    not fix a choice among several, the module takes any choice if free, or
+    the state has no successor if not.
+    '''
+    def successors(state):
+        choices = []
+        for j, enabled in enumerate(game.choices(state)):
+            if j == deviator or len(enabled) == 1:
+                choices.append(enabled)
+            elif (state, j) in strategies:
+                choices.append([strategies[(state, j)]])
+            elif free:
+                choices.append(enabled)
+            else:
+                return set()
+        return game.successors(state, choices)
+    return successors
+
+def open_choice(game, strategies, run, deviator=None, follow=False):
+    '''
+    Return the first (state, module index) along run whose choice the
+    strategies do not fix, ignoring the deviator, and the list of its
+    choices, the ones run takes first if follow, or last if not; or None.
+    '''
+    for position, state in enumerate(run):
+        for j, enabled in enumerate(game.choices(state)):
+            if j != deviator and len(enabled) > 1 and (state, j) not in strategies:
+                if position + 1 == len(run):
+                    return (state, j), enabled
+
+                taken = []
+                for k in enabled:
+                    fixed = dict(strategies)
+                    fixed[(state, j)] = k
+                    if run[position + 1] in profile_successors(game, fixed, deviator, True)(state):
+                        taken.append(k)
+                others = [k for k in enabled if k not in taken]
+                return (state, j), taken + others if follow else others + taken
+    return None
+
+def follows(game, strategies, run, deviator):
+    '''
+    Whether run is still a path of the game when the modules follow
+    strategies, except the deviator.
+    '''
+    successors = profile_successors(game, strategies, deviator, True)
+    return all(run[position + 1] in successors(state) for position, state in enumerate(run[:-1]))
+
+def has_equilibrium_from(game, automata, negations, start, budget=None):
+    '''
+    Decide whether a profile of memoryless strategies is a Nash Equilibrium
+    from the initial state start.
+    automata, negations: the GoalAutomaton of the goal of each module and of
+    its negation, or None for a module without goal
+    budget: a SearchBudget, or None
+    '''
+    players = [i for i, automaton in enumerate(automata) if automaton is not None]
+    conjunctions = {} # winners -> the GoalAutomaton of the conjunction of their goals
+
+    # a partial profile for each set of winners, the largest sets on top, with
+    # the runs found for it: fixing more choices keeps the runs that follow
+    # them, and never makes a run appear in a game where the other choices are free
+    stack = []
+    for size in range(len(players) + 1):
+        for winners in itertools.combinations(players, size):
+            stack.append((winners, {}, {}))
+
+    while stack:
+        winners, strategies, runs = stack.pop()
+
+        def search(key, automaton, deviator):
+            if key not in runs:
+                runs[key] = find_run(automaton, start, profile_successors(game, strategies, deviator, True), budget)
+            return runs[key]
+
+        # the winners achieve their goals and the others cannot in every
+        # completion of the partial profile, or the profile is given up as soon
+        # as no completion can do so; otherwise the profile is fixed further
+        # along an outcome where all winners achieve their goals, or away from
+        # a deviation
+        choice = None
+        if winners:
+            if winners not in conjunctions:
+                conjunctions[winners] = GoalAutomaton(reduce(lambda left, right: BinaryOp("&&", left, right),
+                                                             [game.modules[i].goal for i in winners]), game.index)
+            run = search(winners, conjunctions[winners], None)
+            if run is None:
+                continue
+            if any(search(("loss", i), negations[i], None) is not None for i in winners):
+                choice = open_choice(game, strategies, run, None, True)
+
+        failed = False
+        for i in players:
+            if i in winners:
+                continue
+            run = search(("deviation", i), automata[i], i)
+            if run is None:
+                continue
+            if find_run(automata[i], start, profile_successors(game, strategies, i, False), budget) is not None:
+                failed = True
+                break
+            if choice is None:
+                choice = open_choice(game, strategies, run, i)
+
+        if failed:
+            continue
+        if choice is None:
+            return True
+
+        entry, choices = choice
+        for k in reversed(choices):
+            child = dict(strategies)
+            child[entry] = k
+            child_runs = dict((key, run) for key, run in runs.items()
+                              if run is None or follows(game, child, run, key[1] if key[0] == "deviation" else None))
+            stack.append((winners, child, child_runs))
+
+    return False
+
+def check_explicit(modules, max_states=DEFAULT_EXPLICIT_THRESHOLD, max_search=DEFAULT_MAX_SEARCH):
+    '''
+    Decide whether the game has a Nash Equilibrium on its explicit state space.
+    modules: a list of Module, verified
+    max_states, max_search: the limits past which ExplicitUnsupported is raised
+    Return (verdict, the number of reachable states).
+    '''
+    game = ExplicitGame(modules, max_states)
+    automata = [GoalAutomaton(m.goal, game.index) if m.goal is not None else None for m in modules]
+    negations = [GoalAutomaton(UnaryOp("!", m.goal), game.index) if m.goal is not None else None for m in modules]
+    budget = SearchBudget(max_search)
+    for start in game.initial:
+        if not has_equilibrium_from(game, automata, negations, start, budget):
+            return False, len(game.states)
+    return True, len(game.states)
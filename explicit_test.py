@@ -0,0 +1,120 @@
+import glob
+import unittest
+from distutils.spawn import find_executable
+from rd_parse import *
+from verify import *
+from nash import *
+from explicit import *
+
+def matching_pennies_text(goal_a, goal_b):
+    '''
+    The text of two modules choosing a bit at each step, with the given goals.
+    '''
+    text = ""
+    for name, variable, goal in [("A", "a", goal_a), ("B", "b", goal_b)]:
+        text += "module {0} controls {1}\n" \
+                "    init\n" \
+                "    [] True ~> {1} := False\n" \
+                "    update\n" \
+                "    [] True ~> {1} := True\n" \
+                "    [] True ~> {1} := False\n" \
+                "    goal\n" \
+                "    {2}\n" \
+                "end module\n\n".format(name, variable, goal)
+    return text
+
+def matching_pennies(goal_a, goal_b):
+    '''
+    Two modules choosing a bit at each step, with the given goals.
+    '''
+    modules = parse_RML(matching_pennies_text(goal_a, goal_b))
+    verify_result(modules)
+    return modules
+
+def goal_of_a(formula):
+    return matching_pennies(formula, "True")[0].goal
+
+def read_game(path):
+    with open(path, "r") as f:
+        modules = parse_RML(f.read())
+    verify_result(modules)
+    return modules
+
+class TestExplicitGame(unittest.TestCase):
+    def test_peer_to_peer(self):
+        game = ExplicitGame(read_game("RML_examples/peer_to_peer_communication.rml"))
+        self.assertEqual(["u0", "d0", "u1", "d1"], game.variables)
+        self.assertEqual(4, len(game.initial))
+        self.assertEqual(sorted(game.initial), sorted(game.states))
+        self.assertEqual([[0, 1], [0, 1]], game.choices(game.initial[0]))
+        # the variables, then their copies, which follow them as both modules always take a command
+        self.assertEqual((False, True, True, False) * 2, game.successor(game.initial[0], (1, 0)))
+        self.assertRaises(ExplicitUnsupported, ExplicitGame, read_game("RML_examples/peer_to_peer_communication.rml"), 3)
+
+    def test_casino(self):
+        game = ExplicitGame(read_game("RML_examples/casino.rml"))
+        self.assertEqual(["turn", "coin_c", "coin_p"], game.variables)
+        start = (True, False, False) * 2
+        self.assertIn(start, game.initial)
+        # the Player has no enabled update command on the turn of the Casino, and skips
+        self.assertEqual([[0, 1], [None]], game.choices(start))
+        # so the Environment keeps the copies, and the Player still reads the turn of the Casino from its copy
+        state = game.successor(start, (0, None))
+        self.assertEqual((False, True, False, True, False, False), state)
+        self.assertEqual([[2], [None]], game.choices(state))
+        self.assertEqual(16, len(game.states))
+
+class TestGoalAutomaton(unittest.TestCase):
+    def test_find_run(self):
+        modules = matching_pennies("F a", "G !b")
+        game = ExplicitGame(modules)
+        start = game.initial[0]
+        successors = lambda state: game.successors(state, game.choices(state))
+
+        run = find_run(GoalAutomaton(modules[0].goal, game.index), start, successors)
+        self.assertEqual(start, run[0])
+        self.assertTrue(any(state[0] for state in run))
+        self.assertIsNone(find_run(GoalAutomaton(goal_of_a("F (a && !a)"), game.index), start, successors))
+
+        # a lasso whose cycle goes through states where a holds and does not hold
+        run = find_run(GoalAutomaton(goal_of_a("G F a && G F !a"), game.index), start, successors)
+        cycle = run[run.index(run[-1]):]
+        self.assertTrue(any(state[0] for state in cycle))
+        self.assertTrue(any(not state[0] for state in cycle))
+
+class TestCheckExplicit(unittest.TestCase):
+    def test_examples(self):
+        self.assertEqual((True, 4), check_explicit(read_game("RML_examples/peer_to_peer_communication.rml")))
+        self.assertEqual((True, 4), check_explicit(read_game("RML_examples/peer_to_peer_communication_2.rml")))
+        self.assertEqual((True, 16), check_explicit(read_game("RML_examples/casino.rml")))
+
+    def test_equilibria(self):
+        # both modules achieve their goal by always choosing True
+        self.assertEqual((True, 4), check_explicit(matching_pennies("X G (a && b)", "X G (a && b)")))
+        # whatever the profile, the module that loses can follow or avoid the choice of the other one
+        self.assertEqual((False, 4), check_explicit(matching_pennies("X G ((a -> b) && (b -> a))",
+                                                                     "X G !((a -> b) && (b -> a))")))
+        # B cannot achieve its goal, and A achieves its goal in some profile
+        self.assertEqual((True, 4), check_explicit(matching_pennies("G F a", "F (b && !b)")))
+
+    def test_unsupported(self):
+        modules = read_game("RML_examples/peer_to_peer_communication.rml")
+        self.assertRaises(ExplicitUnsupported, check_explicit, modules, 3)
+        self.assertRaises(ExplicitUnsupported, check_explicit, modules, 64, 10)
+
+    @unittest.skipUnless(find_executable("mcmas"), "MCMAS is not installed")
+    def test_against_mcmas(self):
+        # a module deviating with a memoryless strategy deviates with memory, so
+        # an explicit TRUE is a TRUE of MCMAS
+        options = CheckOptions(parser="rd", explicit_threshold=0)
+        for path in sorted(glob.glob("RML_examples/*.rml")):
+            try:
+                verdict, states = check_explicit(read_game(path), 1024)
+            except (ParseException, ExplicitUnsupported):
+                continue
+            if verdict:
+                with open(path, "r") as f:
+                    self.assertIs(True, check_nash_equilibrium(f.read(), options).verdict, path)
+
+if __name__ == "__main__":
+    unittest.main()
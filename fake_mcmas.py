@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+'''
+This module is a stand-in for the mcmas executable, to test and benchmark the
+tool on hosts without MCMAS: './main.py --mcmas-executable ./fake_mcmas.py'.
+It reads the agents, variables and formulae of the ISPL file and prints what
+MCMAS prints, with a verdict for each formula, but does not check anything.
+The delay, the verdicts, the amount of output after the verdicts (as for
+counterexamples) and the memory used are set by options, or by the
+environment variables FAKE_MCMAS_DELAY, FAKE_MCMAS_VERDICT,
+FAKE_MCMAS_OUTPUT_SIZE and FAKE_MCMAS_MEMORY when the tool passes no options.
+Tests get an 'mcmas' executable running it with fixed options from
+write_stand_in.
+'''
+import argparse
+import hashlib
+import os
+import pipes
+import re
+import sys
+import time
+
+header = """************************************************************************
+                       MCMAS v1.2.2 (fake)
+
+   This software comes with ABSOLUTELY NO WARRANTY, to the extent
+   permitted by applicable law.
+
+   Please check http://vas.doc.ic.ac.uk/tools/mcmas/ for the latest release.
+   Please send any feedback to <mcmas@imperial.ac.uk>
+************************************************************************
+"""
+
+agent_pattern = re.compile(r"^\s*Agent\s+(\w+)", re.M)
+variable_pattern = re.compile(r"^\s*(\w+)\s*:\s*boolean\s*;", re.M)
+formulae_pattern = re.compile(r"^\s*Formulae\s*$(.*?)^\s*end Formulae", re.M | re.S)
+
+def read_ispl(ispl_text):
+    '''
+    Return the agents, the number of boolean variables and the list of
+    formulae of an ISPL file, each formula on one line.
+    '''
+    agents = agent_pattern.findall(ispl_text)
+    variables = len(variable_pattern.findall(ispl_text))
+
+    formulae = []
+    m = formulae_pattern.search(ispl_text)
+    if m is not None:
+        for formula in m.group(1).split(";"):
+            formula = " ".join(formula.split())
+            if formula:
+                formulae.append(formula)
+
+    return agents, variables, formulae
+
+def verdicts(ispl_text, formulae, verdict):
+    '''
+    Return the verdict of each formula: "true", "false", or with "hash" one
+    that depends only on the ISPL text, so that it is the same on every run.
+    '''
+    result = []
+    for i in range(len(formulae)):
+        if verdict == "hash":
+            # the same bytes are hashed by Python 2 and Python 3, whichever runs this file
+            digest = hashlib.sha1((ispl_text + str(i)).encode("utf-8")).digest()
+            result.append(bytearray(digest)[0] % 2 == 0)
+        else:
+            result.append(verdict == "true")
+    return result
+
+def write_stand_in(path, *options):
+    '''
+    Write an executable shell script at path that runs this file with the
+    given options, by the Python running the caller, and return path.
+    '''
+    with open(path, "w") as f:
+        f.write("#!/bin/sh\nexec {} {} {} \"$@\"\n".format(pipes.quote(sys.executable),
+                                                       pipes.quote(os.path.splitext(os.path.abspath(__file__))[0] + ".py"),
+                                                       " ".join(pipes.quote(o) for o in options)))
+    os.chmod(path, 0o755)
+    return path
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(description="A stand-in for MCMAS.")
+    argparser.add_argument("ispl_file")
+    argparser.add_argument("--delay", type=float, default=float(os.environ.get("FAKE_MCMAS_DELAY", 0)),
+                           help="seconds spent before printing the verdicts")
+    argparser.add_argument("--verdict", choices=["true", "false", "hash"],
+                           default=os.environ.get("FAKE_MCMAS_VERDICT", "hash"))
+    argparser.add_argument("--output-size", type=int, default=int(os.environ.get("FAKE_MCMAS_OUTPUT_SIZE", 0)),
+                           help="bytes printed after the verdicts")
+    argparser.add_argument("--memory", type=int, default=int(os.environ.get("FAKE_MCMAS_MEMORY", 0)),
+                           help="MB of memory to allocate")
+    argparser.add_argument("--runs-file", help="append a line to this file on each run, to count the runs")
+    args = argparser.parse_args()
+
+    if args.runs_file:
+        with open(args.runs_file, "a") as f:
+            f.write("run\n")
+
+    sys.stdout.write(header + "\n")
+    sys.stdout.write("Command line: mcmas " + " ".join(sys.argv[1:]) + "\n\n")
+    try:
+        with open(args.ispl_file, "r") as f:
+            ispl_text = f.read()
+    except IOError:
+        sys.stdout.write("File " + args.ispl_file + " does not exist.\n")
+        sys.exit(1)
+
+    agents, variables, formulae = read_ispl(ispl_text)
+    if "Environment" not in agents or not formulae:
+        sys.stdout.write("syntax error: " + args.ispl_file + " is not a complete ISPL file\n")
+        sys.exit(1)
+
+    sys.stdout.write(args.ispl_file + " has been parsed successfully.\n")
+    sys.stdout.write("Global syntax checking...\n")
+    for agent in agents:
+        sys.stdout.write("1\n")
+    sys.stdout.write("Done\n")
+    sys.stdout.write("Encoding BDD parameters...\n")
+    sys.stdout.write("Building partial transition relation...\n")
+    sys.stdout.write("Building BDD for initial states...\n")
+    sys.stdout.write("Building reachable state space...\n")
+    sys.stdout.write("Checking formulae...\n")
+    sys.stdout.flush()
+
+    memory = " " * (args.memory * 1024 * 1024)
+    start = time.time()
+    time.sleep(args.delay)
+
+    sys.stdout.write("Verifying properties...\n")
+    for i, (formula, verdict) in enumerate(zip(formulae, verdicts(ispl_text, formulae, args.verdict))):
+        sys.stdout.write("  Formula number {}: {}, is {} in the model\n".format(i + 1, formula, "TRUE" if verdict else "FALSE"))
+    sys.stdout.flush()
+
+    line = "  " + " ".join(agent + ".Action = skip" for agent in agents) + "\n"
+    written = 0
+    while written < args.output_size:
+        sys.stdout.write(line)
+        written += len(line)
+
+    sys.stdout.write("done, {} formulae successfully read and checked\n".format(len(formulae)))
+    sys.stdout.write("execution time = {:.3f}\n".format(time.time() - start))
+    sys.stdout.write("number of reachable states = {}\n".format(2 ** min(variables, 62)))
+    sys.stdout.write("BDD memory in use = {}\n".format(len(ispl_text) * 1024 + len(memory)))
@@ -0,0 +1,54 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from generate import *
+from rd_parse import *
+from mcmas import *
+from fake_mcmas import *
+
+class TestFakeMCMAS(unittest.TestCase):
+    executable = os.path.abspath("fake_mcmas.py")
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open("RML_examples/casino.rml", "r") as f:
+            self.ispl = generate_ispl(parse_RML(f.read()), verbose=False)
+        self.ispl_file_name = os.path.join(self.directory, "casino.ispl")
+        with open(self.ispl_file_name, "w") as f:
+            f.write(self.ispl)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_ispl(self):
+        agents, variables, formulae = read_ispl(self.ispl)
+        self.assertEqual(["Environment", "Casino", "Player"], agents)
+        self.assertEqual(1, len(formulae))
+        self.assertTrue(formulae[0].startswith("<<ste>> (Environment, ste)"))
+
+    def test_verdicts(self):
+        for verdict in ["true", "false"]:
+            mcmas_output = run_mcmas(self.ispl_file_name, self.executable, ["--verdict", verdict])
+            self.assertEqual({1: verdict == "true"}, parse_verdicts(mcmas_output))
+            self.assertIn("number of reachable states", mcmas_output)
+
+        first = check_ispl(self.ispl_file_name, executable=self.executable)[0]
+        self.assertIn(first, [True, False])
+        self.assertEqual(first, check_ispl(self.ispl_file_name, executable=self.executable)[0])
+
+    def test_output_size(self):
+        mcmas_output = run_mcmas(self.ispl_file_name, self.executable, ["--output-size", "100000"])
+        self.assertGreater(len(mcmas_output), 100000)
+        mcmas_output = run_mcmas(self.ispl_file_name, self.executable, ["--output-size", "100000"], stop_after=1)
+        self.assertLess(len(mcmas_output), 100000)
+
+    def test_errors(self):
+        self.assertRaises(subprocess.CalledProcessError, run_mcmas, os.path.join(self.directory, "none.ispl"), self.executable)
+        with open(self.ispl_file_name, "w") as f:
+            f.write("Agent Player\nend Agent\n")
+        self.assertRaises(subprocess.CalledProcessError, run_mcmas, self.ispl_file_name, self.executable)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+'''
+This module builds binary syntax trees of propositional and LTL formulas.
+The pyparsing grammar returns a formula as a flat list of tokens, with a nested
+list for each parenthesised sub-formula. build_formula_tree turns such a list
+into a tree with the usual operator precedence, from tightest to loosest:
+    ! X F G  (unary)
+    U        (right associative)
+    &&
+    ||
+    ->       (right associative)
+'''
+
+UNARY_OPERATORS = set(["!", "X", "F", "G"])
+BINARY_PRECEDENCE = {"->": 1, "||": 2, "&&": 3, "U": 4}
+RIGHT_ASSOCIATIVE = set(["->", "U"])
+
+class Constant(object):
+    '''
+    The boolean literal True or False.
+    '''
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value # "True" or "False"
+
+    def __repr__(self):
+        return "Constant(" + repr(self.value) + ")"
+
+class Variable(object):
+    '''
+    An identifier.
+    '''
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "Variable(" + repr(self.name) + ")"
+
+class UnaryOp(object):
+    '''
+    One of the unary operators ! X F G applied to a formula.
+    '''
+    __slots__ = ("op", "operand")
+
+    def __init__(self, op, operand):
+        self.op = op
+        self.operand = operand
+
+    def __repr__(self):
+        return "UnaryOp(" + repr(self.op) + ", " + repr(self.operand) + ")"
+
+class BinaryOp(object):
+    '''
+    One of the binary operators U && || -> applied to two formulas.
+    '''
+    __slots__ = ("op", "left", "right")
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def __repr__(self):
+        return "BinaryOp(" + repr(self.op) + ", " + repr(self.left) + ", " + repr(self.right) + ")"
+
+def build_formula_tree(tokens):
+    '''
+    Return the syntax tree of a formula given as a list of tokens, in which
+    each parenthesised sub-formula is a nested list.
+    Operators are resolved by precedence climbing with explicit stacks, so long
+    chains of binary operators cost linear time and no recursion.
+    '''
+    operands = [] # the trees built so far
+    operators = [] # the binary operators waiting for their right operand
+
+    def reduce_top():
+        op = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        operands.append(BinaryOp(op, left, right))
+
+    unary_list = [] # the unary operators waiting for their operand
+    expect_operand = True
+    for t in tokens:
+        if expect_operand:
+            if isinstance(t, basestring) and t in UNARY_OPERATORS:
+                unary_list.append(t)
+                continue
+
+            if not isinstance(t, basestring): # a parenthesised sub-formula
+                operand = build_formula_tree(t)
+            elif t == "True" or t == "False":
+                operand = Constant(t)
+            else:
+                operand = Variable(t)
+
+            while unary_list:
+                operand = UnaryOp(unary_list.pop(), operand)
+
+            operands.append(operand)
+            expect_operand = False
+        else:
+            if t not in BINARY_PRECEDENCE:
+                raise ValueError("Expected a binary operator, got " + repr(t) + ".")
+
+            precedence = BINARY_PRECEDENCE[t]
+            while operators:
+                top_precedence = BINARY_PRECEDENCE[operators[-1]]
+                if top_precedence > precedence or (top_precedence == precedence and t not in RIGHT_ASSOCIATIVE):
+                    reduce_top()
+                else:
+                    break
+
+            operators.append(t)
+            expect_operand = True
+
+    if expect_operand:
+        raise ValueError("Incomplete formula: " + repr(tokens) + ".")
+
+    while operators:
+        reduce_top()
+
+    return operands[0]
+
+def tree_size(tree):
+    '''
+    Return the number of nodes of a formula tree.
+    '''
+    size = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        size += 1
+        if isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, BinaryOp):
+            stack.append(node.left)
+            stack.append(node.right)
+
+    return size
@@ -0,0 +1,52 @@
+import unittest
+from formula import *
+from parse import *
+
+class TestFormulaTree(unittest.TestCase):
+    parser = build_propositional_formula_parser()
+    parser_LTL = build_LTL_formula_parser()
+
+    def tree(self, s):
+        return repr(build_formula_tree(self.parser.parseString(s).asList()))
+
+    def tree_LTL(self, s):
+        return repr(build_formula_tree(self.parser_LTL.parseString(s).asList()))
+
+    def test_precedence(self):
+        self.assertEqual(self.tree("a || (b && c)"), self.tree("a || b && c"))
+        self.assertEqual(self.tree("(a && b) || c"), self.tree("a && b || c"))
+        self.assertEqual(self.tree("(a || b) -> (c && d)"), self.tree("a || b -> c && d"))
+        self.assertEqual(self.tree("(!a) && b"), self.tree("!a && b"))
+
+    def test_associativity(self):
+        self.assertEqual(self.tree("a -> (b -> c)"), self.tree("a -> b -> c"))
+        self.assertEqual(self.tree("(a && b) && c"), self.tree("a && b && c"))
+        self.assertEqual(self.tree_LTL("a U (b U c)"), self.tree_LTL("a U b U c"))
+
+    def test_LTL(self):
+        self.assertEqual(self.tree_LTL("(G (F p)) -> (F (q || s))"), self.tree_LTL("GFp->F(q||s)"))
+        self.assertEqual(self.tree_LTL("((X p) U q) && r"), self.tree_LTL("Xp U q && r"))
+
+    def test_long_chain(self):
+        tokens = ["p0"]
+        for i in range(1, 5000):
+            tokens.extend(["->", "p" + str(i)])
+
+        tree = build_formula_tree(tokens)
+        self.assertEqual("p0", tree.left.name)
+        self.assertEqual("->", tree.right.op)
+
+    def test_long_chain_parsed(self):
+        tree = build_formula_tree(self.parser.parseString(" -> ".join(["p"] * 300), parseAll=True).asList())
+        depth = 0
+        while isinstance(tree, BinaryOp):
+            self.assertEqual("p", tree.left.name)
+            tree = tree.right
+            depth += 1
+        self.assertEqual(299, depth)
+
+        tree = build_formula_tree(self.parser_LTL.parseString("!" * 300 + "X p", parseAll=True).asList())
+        self.assertEqual(300, tree_size(tree) - 2)
+
+if __name__ == "__main__":
+    unittest.main()
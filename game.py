@@ -0,0 +1,138 @@
+'''
+This module converts parsed RML modules into compact game objects.
+verify.py and generate.py work on these objects instead of pyparsing results.
+All identifiers are interned, so equal names share one string object.
+'''
+from formula import *
+
+class Assignment(object):
+    '''
+    One assignment "variable := formula" in the action part of a guarded command.
+    '''
+    __slots__ = ("variable", "formula", "variables")
+
+    def __init__(self, variable, formula, variables):
+        self.variable = variable # the assigned variable
+        self.formula = formula # the formula tree of the assigned value
+        self.variables = variables # a tuple of variables in the formula
+
+    def __repr__(self):
+        return "Assignment(" + repr(self.variable) + ", " + repr(self.formula) + ")"
+
+class GuardedCommand(object):
+    '''
+    A guarded command "[] condition ~> assignment, ...".
+    '''
+    __slots__ = ("condition", "condition_variables", "actions")
+
+    def __init__(self, condition, condition_variables, actions):
+        self.condition = condition # the formula tree of the condition
+        self.condition_variables = condition_variables # a tuple of variables in the condition
+        self.actions = actions # a tuple of Assignment
+
+    def __repr__(self):
+        return "GuardedCommand(" + repr(self.condition) + ", " + repr(self.actions) + ")"
+
+class Module(object):
+    '''
+    A RML module.
+    '''
+    __slots__ = ("name", "variables", "init", "update", "goal", "goal_variables")
+
+    def __init__(self, name, variables, init, update, goal, goal_variables):
+        self.name = name
+        self.variables = variables # a tuple of controlled variables
+        self.init = init # a tuple of GuardedCommand
+        self.update = update # a tuple of GuardedCommand
+        self.goal = goal # the formula tree of the goal, or None
+        self.goal_variables = goal_variables # a tuple of variables in the goal
+
+    def __repr__(self):
+        return "Module(" + ", ".join(repr(x) for x in (self.name, self.variables, self.init, self.update, self.goal)) + ")"
+
+def intern_tree(tree):
+    '''
+    Intern the identifiers of a formula tree in place, and return the tuple of
+    distinct variables in the order of their first appearance.
+    '''
+    variables = []
+    seen = set([])
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Variable):
+            node.name = intern(node.name)
+            if node.name not in seen:
+                seen.add(node.name)
+                variables.append(node.name)
+        elif isinstance(node, UnaryOp):
+            stack.append(node.operand)
+        elif isinstance(node, BinaryOp):
+            stack.append(node.right)
+            stack.append(node.left)
+
+    return tuple(variables)
+
+def intern_module(m):
+    '''
+    Intern the identifiers of the Module m in place, and return m.
+    Unpickling, as when a Module comes back from another process, gives each
+    name a fresh string object.
+    '''
+    m.name = intern(m.name)
+    m.variables = tuple(intern(v) for v in m.variables)
+    for gc in m.init + m.update:
+        gc.condition_variables = intern_tree(gc.condition)
+        for action in gc.actions:
+            action.variable = intern(action.variable)
+            action.variables = intern_tree(action.formula)
+    if m.goal is not None:
+        m.goal_variables = intern_tree(m.goal)
+
+    return m
+
+def formula_from_tokens(tokens):
+    '''
+    Return the (tree, variables) pair of a formula given as a list of tokens.
+    '''
+    tree = build_formula_tree(tokens)
+    return tree, intern_tree(tree)
+
+def convert_formula(tokens):
+    '''
+    Return the (tree, variables) pair of a parsed formula.
+    '''
+    return formula_from_tokens(tokens.asList())
+
+def convert_guarded_command(gc):
+    condition, condition_variables = convert_formula(gc["condition_part"])
+
+    actions = []
+    for action in gc["action_part"]:
+        formula, variables = convert_formula(action["assignment"])
+        actions.append(Assignment(intern(action["assigned_variable"][0]), formula, variables))
+
+    return GuardedCommand(condition, condition_variables, tuple(actions))
+
+def convert_module(m):
+    '''
+    Convert one parsed module result into a Module.
+    '''
+    goal = None
+    goal_variables = ()
+    if "goal" in m:
+        goal, goal_variables = convert_formula(m["goal"]["formula"])
+
+    return Module(intern(m["name"][0]),
+                  tuple(intern(v) for v in m["variable_list"]),
+                  tuple(convert_guarded_command(gc) for gc in m["init"]),
+                  tuple(convert_guarded_command(gc) for gc in m["update"]),
+                  goal,
+                  goal_variables)
+
+def convert_result(r):
+    '''
+    r: a list of parsed module results
+    Return a list of Module.
+    '''
+    return [convert_module(m) for m in r]
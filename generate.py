@@ -2,145 +2,261 @@
 This file generates the ISPL file.
 '''
 import itertools
+import os
+from verify import build_symbol_table
+from formula import *
 
-# Define some global variables
-count_commands_list = [] # a list of counting 'update' guarded commands in each module
-count_env_protocols = 1 # the number of protocols in environment agent
+ISPL_BINARY_OPERATORS = {"&&": " and ", "||": " or ", "U": " U "}
+
+class GenerationContext(object):
+    '''
+    Hold all the state of one generation run, so that generate_ispl can be
+    called repeatedly, or from several threads, without runs affecting each other.
+    '''
+    def __init__(self, result, symbols=None):
+        '''
+        result: a list of Module
+        symbols: the symbol table returned by verify_result, built here if not given
+        '''
+        self.result = result
+        self.symbols = symbols if symbols is not None else build_symbol_table(result)
+
+        self.count_commands_list = [] # a list of counting 'update' guarded commands in each module
+        self.count_env_protocols = 1 # the number of protocols in environment agent
+        for module in result:
+            self.count_commands_list.append(len(module.update))
+            self.count_env_protocols = self.count_env_protocols * len(module.update)
+
+        self.env_assignment_cache = {} # (module index, command index) -> translated Environment assignments
+
+    def env_assignments(self, module_idx, gc_idx):
+        '''
+        Return the Environment assignments of an 'update' guarded command,
+        as a list of "<module>_<variable> = <formula>" strings.
+        '''
+        key = (module_idx, gc_idx)
+        if key not in self.env_assignment_cache:
+            module = self.result[module_idx]
+            module_name = module.name
+            ass_str_list = []
+            for ass in module.update[gc_idx].actions:
+                assigned_variable = ass.variable
+                assignment = translate_tree(ass.formula, self.result, -1, self.symbols)
+                ass_str_list.append(module_name + "_" + assigned_variable + " = " + assignment)
+            self.env_assignment_cache[key] = ass_str_list
+
+        return self.env_assignment_cache[key]
 
 '''
 '------ Some helper functions ------
 '''
-def find_module_name(result, var_name):
+def find_module_name(result, var_name, symbols=None):
     # find the module name containing the specified variable name
+    if symbols is not None:
+        if var_name in symbols:
+            return symbols[var_name][0]
+        raise NameError("Variable " + var_name + " not found in any module.")
+
     for m in result:
-        if var_name in m["variable_list"].asList():
-            return m["name"][0]
+        if var_name in m.variables:
+            return m.name
 
     raise NameError("Variable " + var_name + " not found in any module.")
 
-def translate_formula(prop_list, level, result, module_idx):
-    s = "(" if level != 0 else ""
+def translate_identifier(name, result, module_idx, symbols=None):
+    if module_idx == -2: # Formulae section
+        return name
 
-    for i, item in enumerate(prop_list):
-        if item == "True":
-            if module_idx == -2: # formulae section
-                s += "const_true"
-            else:
-                s += "true"
-        elif item == "False":
+    containing_module = find_module_name(result, name, symbols)
+    if module_idx == -1: # Environemnt agent
+        return containing_module + "_" + name + " = true"
+    else: # Standard agent
+        if containing_module == result[module_idx].name:
+            return name + " = true"
+        else:
+            return "Environment." + containing_module + "_" + name + " = true"
+
+def needs_parentheses(child, parent_op, is_left):
+    # decide whether the operand of a binary or unary operator is parenthesised
+    if isinstance(child, UnaryOp):
+        # keep temporal operators from taking in the rest of a binary formula
+        return child.op != "!" and parent_op in BINARY_PRECEDENCE
+    if not isinstance(child, BinaryOp):
+        return False
+    if parent_op in UNARY_OPERATORS or child.op != parent_op:
+        return True
+
+    # the same binary operator, only parenthesise against its associativity
+    return is_left == (parent_op in RIGHT_ASSOCIATIVE)
+
+def translate_tree(tree, result, module_idx, symbols=None):
+    '''
+    Translate a formula tree into ISPL.
+    module_idx: -1 for the Environment agent, -2 for the Formulae section,
+                otherwise the index of the standard agent
+    The tree is walked with an explicit stack, in time linear in its size.
+    '''
+    parts = []
+    stack = [tree]
+
+    def push(node, parent_op, is_left):
+        if needs_parentheses(node, parent_op, is_left):
+            stack.extend([")", node, "("])
+        else:
+            stack.append(node)
+
+    while stack:
+        item = stack.pop()
+        if isinstance(item, basestring):
+            parts.append(item)
+        elif isinstance(item, Constant):
             if module_idx == -2: # formulae section
-                s += "!const_true"
+                parts.append("const_true" if item.value == "True" else "!const_true")
             else:
-                s += "false"
-        elif item == "&&":
-            s += " and "
-        elif item == "||":
-            s += " or "
-        elif item == "!":
-            s += "!"
-        elif item == "G":
-            s += "G "
-        elif item == "F":
-            s += "F "
-        elif item == "X":
-            s += "X "
-        elif item == "U":
-            s += " U "
-        elif type(item) == type([]):
-            s += translate_formula(item, level+1, result, module_idx)
-        elif item == "->":
-            if level != 0:
-                s = "(!" + s + ")"
+                parts.append("true" if item.value == "True" else "false")
+        elif isinstance(item, Variable):
+            parts.append(translate_identifier(item.name, result, module_idx, symbols))
+        elif isinstance(item, UnaryOp):
+            push(item.operand, item.op, False)
+            stack.append("!" if item.op == "!" else item.op + " ")
+        elif item.op == "->":
+            # a -> b is translated as !(a) or (b)
+            stack.append(")")
+            stack.append(item.right)
+            stack.append(") or (")
+            if isinstance(item.left, BinaryOp) and item.left.op == "->":
+                stack.extend([")", item.left, "("])
             else:
-                s = "!(" + s + ")"
-
-            s += " or (" + translate_formula(prop_list[i+1:], 0, result, module_idx) + ")"
-            break
+                stack.append(item.left)
+            stack.append("!(")
         else:
-            # item is an identifier
-            containing_module = find_module_name(result, item)
-            if module_idx == -1: # Environemnt agent
-                s += containing_module + "_" + item + " = true"
-            elif module_idx == -2: # Formulae section
-                s += item
-            else: # Standard agent
-                if containing_module == result[module_idx]["name"][0]:
-                    s += item + " = true"
-                else:
-                    s += "Environment." + containing_module + "_" + item + " = true"
-
-    s += ")" if level != 0 else ""
-    return s
+            push(item.right, item.op, False)
+            stack.append(ISPL_BINARY_OPERATORS[item.op])
+            push(item.left, item.op, True)
+
+    return "".join(parts)
+
+def translate_formula(prop_list, result=None, module_idx=-2, symbols=None):
+    '''
+    Translate a formula given as a list of parsed tokens into ISPL.
+    '''
+    return translate_tree(build_formula_tree(prop_list), result, module_idx, symbols)
 
 '''
 '------ End of helper functions ------
 '''
-def generate_ispl(result):
-    global count_commands_list
-    global count_env_protocols
+def ispl_file_name(input_file_path, directory="./ispl"):
+    '''
+    Return the path of the ISPL file generated for the RML file input_file_path:
+    its base name in directory, with the ".rml" extension replaced by ".ispl".
+    '''
+    input_file_name = os.path.basename(input_file_path)
 
-    # Pre-work
-    for module in result:
-        count_commands_list.append(len(module["update"]))
-        count_env_protocols = count_env_protocols * len(module["update"])
+    if input_file_name.split(".")[-1] == "rml": # input filename ends in .rml
+        return os.path.join(directory, ".".join(input_file_name.split(".")[0:-1]) + ".ispl")
+    else: # input filename does not end in .rml
+        return os.path.join(directory, input_file_name + ".ispl")
 
-    s = ""
+def generate_ispl(result, symbols=None, verbose=True):
+    '''
+    result: a list of Module
+    symbols: the symbol table returned by verify_result, built here if not given.
+    verbose: if True, print a line after each generated section.
+    Return the whole ISPL file as a string.
+    '''
+    return "".join(iter_ispl(result, symbols, verbose))
+
+def write_ispl(result, f, symbols=None, verbose=True):
+    '''
+    Write the ISPL file chunk by chunk to the file-like object f, so the whole
+    model is never held in memory at once.
+    '''
+    for chunk in iter_ispl(result, symbols, verbose):
+        f.write(chunk)
+
+def iter_ispl(result, symbols=None, verbose=True):
+    '''
+    Yield the ISPL file as a sequence of string chunks.
+    Each call uses its own GenerationContext.
+    '''
+    ctx = GenerationContext(result, symbols)
 
     '''
     1. Generate Environment agent.
     '''
-    s += generate_environment(result)
-    print "Generated Environment agent."
+    for chunk in iter_environment(ctx):
+        yield chunk
+    if verbose:
+        print "Generated Environment agent."
 
     '''
     2. Generate each standard agent.
     '''
     for i, m in enumerate(result):
-        s += generate_standard_agent(result, i)
-        print "Generated agent {}".format(str(i))
-    print "Generated Standard agent."
+        for chunk in iter_standard_agent(ctx, i):
+            yield chunk
+        if verbose:
+            print "Generated agent {}".format(str(i))
+    if verbose:
+        print "Generated Standard agent."
 
     '''
     3. Generate Evaluation section.
     '''
-    s += generate_evaluation(result)
-    print "Generated Evaluation section."
+    for chunk in iter_evaluation(ctx):
+        yield chunk
+    if verbose:
+        print "Generated Evaluation section."
 
     '''
     4. Generate InitStates section.
     '''
-    s += generate_initstates(result)
-    print "Generated InitStates section."
+    for chunk in iter_initstates(ctx):
+        yield chunk
+    if verbose:
+        print "Generated InitStates section."
 
     '''
     5. Generate Formulae section.
     '''
-    s += generate_formulae(result)
-    print "Generated Formulae section.",
+    for chunk in iter_formulae(ctx):
+        yield chunk
+    if verbose:
+        print "Generated Formulae section.",
 
-    return s
+def generate_environment(ctx):
+    return "".join(iter_environment(ctx))
 
-def generate_environment(result):
+def iter_environment(ctx):
     '''
     Generate the environment section.
     '''
-    s = ""
-    s += "Agent Environment\n    Obsvars:\n"
+    yield "Agent Environment\n    Obsvars:\n"
 
-    for module in result:
-        module_name = module["name"][0]
-        for variable in module["variable_list"]:
-            s += "        " + module_name + "_" + variable + " : boolean;\n"
+    for module in ctx.result:
+        module_name = module.name
+        for variable in module.variables:
+            yield "        " + module_name + "_" + variable + " : boolean;\n"
 
-    s += "        const_true : boolean;\n" # used for const true conditions
-    s += "    end Obsvars\n"
-    s += "    Actions = { skip };\n"
-    s += "    Protocol:\n        Other : { skip }; \n    end Protocol\n"
-    s += "    Evolution:\n"
+    yield "        const_true : boolean;\n" # used for const true conditions
+    yield "    end Obsvars\n"
+    yield "    Actions = { skip };\n"
+    yield "    Protocol:\n        Other : { skip }; \n    end Protocol\n"
+    yield "    Evolution:\n"
 
     # Generate the Evolution part
+    for line in iter_product_evolution(ctx):
+        yield line
+
+    yield "    end Evolution\n" + \
+          "end Agent\n\n"
+
+def iter_product_evolution(ctx):
+    '''
+    Yield one Evolution line for each combination of 'update' guarded commands.
+    '''
     iter_list = []
-    for count in count_commands_list:
+    for count in ctx.count_commands_list:
         iter_list.append(range(count))
 
     for indices in itertools.product(*iter_list):
@@ -151,150 +267,152 @@ def generate_environment(result):
         ass_str_list = []
         cond_str_list = []
         for module_idx, gc_idx in enumerate(indices):
-            for ass in result[module_idx]["update"][gc_idx]["action_part"]:
-                assigned_variable = ass["assigned_variable"][0]
-                assignment = translate_formula(ass["assignment"].asList(), 0, result, -1)
-                ass_str_list.append(result[module_idx]["name"][0] + "_" + assigned_variable + " = " + assignment)
+            ass_str_list.extend(ctx.env_assignments(module_idx, gc_idx))
 
-            cond_str = result[module_idx]["name"][0] + ".Action = gc" + str(gc_idx)
+            cond_str = ctx.result[module_idx].name + ".Action = gc" + str(gc_idx)
             cond_str_list.append(cond_str)
 
-        s += "        (" + \
-             " and ".join(ass_str_list) + \
-             ") if " + \
-             " and ".join(cond_str_list) + \
-             ";\n"
+        yield "        (" + \
+              " and ".join(ass_str_list) + \
+              ") if " + \
+              " and ".join(cond_str_list) + \
+              ";\n"
 
-    s += "    end Evolution\n" + \
-         "end Agent\n\n"
-    return s
+def generate_standard_agent(ctx, idx):
+    return "".join(iter_standard_agent(ctx, idx))
 
-def generate_standard_agent(result, idx):
+def iter_standard_agent(ctx, idx):
     '''
-    Generate the ith module in result.
+    Generate the ith module in ctx.result.
     '''
+    result = ctx.result
     module = result[idx]
-    s = ""
-    name = module["name"][0]
-    s += "Agent " + name + "\n" + \
-         "    Vars:\n"
+    name = module.name
+    yield "Agent " + name + "\n" + \
+          "    Vars:\n"
 
-    for v in module["variable_list"]:
-        s += "        " + v + " : boolean;\n"
+    for v in module.variables:
+        yield "        " + v + " : boolean;\n"
 
-    s += "    end Vars\n" + \
-         "    Actions = { "
+    yield "    end Vars\n" + \
+          "    Actions = { "
 
-    action_count = len(module["update"])
+    action_count = len(module.update)
     action_str_list = ["gc" + str(i) for i in range(action_count)]
     action_str_list.append("skip")
 
-    s += ", ".join(action_str_list) + " };\n" + \
-         "    Protocol:\n"
+    yield ", ".join(action_str_list) + " };\n" + \
+          "    Protocol:\n"
 
-    for i, gc in enumerate(module["update"]):
-        gc_condition = gc["condition_part"]
+    for i, gc in enumerate(module.update):
+        gc_condition = gc.condition
 
         # if it's the true = true case, use Environment.const_true
         condition = ""
-        if len(gc_condition) == 1 and gc_condition[0] == "True":
+        if isinstance(gc_condition, Constant) and gc_condition.value == "True":
             condition = "Environment.const_true = true"
         else:
-            condition = translate_formula(gc_condition.asList(), 0, result, idx)
+            condition = translate_tree(gc_condition, result, idx, ctx.symbols)
 
-        s += "        " + condition + " : { gc" + str(i) + " };\n"
+        yield "        " + condition + " : { gc" + str(i) + " };\n"
 
 
-    s += "        Other : { skip };\n" + \
-         "    end Protocol\n" + \
-         "    Evolution:\n"
+    yield "        Other : { skip };\n" + \
+          "    end Protocol\n" + \
+          "    Evolution:\n"
 
-    for i, gc in enumerate(module["update"]):
+    for i, gc in enumerate(module.update):
         ass_str_list = []
-        for ass in gc["action_part"]:
-            ass_str_list.append(ass["assigned_variable"][0] + " = " + translate_formula(ass["assignment"].asList(), 0, result, idx))
+        for ass in gc.actions:
+            ass_str_list.append(ass.variable + " = " + translate_tree(ass.formula, result, idx, ctx.symbols))
 
-        s += "        " + " and ".join(ass_str_list) + " if Action = gc" + str(i) + ";\n"
+        yield "        " + " and ".join(ass_str_list) + " if Action = gc" + str(i) + ";\n"
 
-    s += "    end Evolution\n" + \
-         "end Agent\n\n"
+    yield "    end Evolution\n" + \
+          "end Agent\n\n"
 
-    return s
+def generate_evaluation(ctx):
+    return "".join(iter_evaluation(ctx))
 
-def generate_evaluation(result):
+def iter_evaluation(ctx):
     '''
     Generate the evaluation section.
     '''
-    s = "Evaluation\n"
-    for module in result:
-        for var in module["variable_list"]:
-            s += "    " + var + " if " + module["name"][0] + "." + var + " = true;\n"
-    s += "    const_true if Environment.const_true = true;\n"
-    s += "end Evaluation\n\n"
-    return s
+    yield "Evaluation\n"
+    for module in ctx.result:
+        for var in module.variables:
+            yield "    " + var + " if " + module.name + "." + var + " = true;\n"
+    yield "    const_true if Environment.const_true = true;\n"
+    yield "end Evaluation\n\n"
 
-def generate_initstates(result):
+def generate_initstates(ctx):
+    return "".join(iter_initstates(ctx))
+
+def iter_initstates(ctx):
     '''
     Generate the InitStates section.
+    The section is one formula, yielded one init guarded command at a time.
     '''
-    s = "InitStates\n    "
+    yield "InitStates\n    "
 
-    module_init_list = []
-    for idx, module in enumerate(result):
-        module_name = module["name"][0]
+    for idx, module in enumerate(ctx.result):
+        module_name = module.name
 
-        gc_init_list = []
-        for gc in module["init"]:
+        yield "("
+        for gc_idx, gc in enumerate(module.init):
             # record all controleld variables for this module, for the purpose of default initialization
-            controlled_variables = set(module["variable_list"].asList())
+            controlled_variables = set(module.variables)
 
             action_init_list = []
-            for action in gc["action_part"]:
-                variable = action["assigned_variable"][0]
+            for action in gc.actions:
+                variable = action.variable
                 controlled_variables.remove(variable) # initialized variable
-                assignment = action["assignment"]
+                assignment = translate_tree(action.formula, ctx.result, idx, ctx.symbols)
 
-                action_init_list.append(module_name + "." + variable + " = " + translate_formula(assignment.asList(), 0, result, idx))
-                action_init_list.append("Environment." + module_name + "_" + variable + " = " + translate_formula(assignment.asList(), 0, result, idx))
+                action_init_list.append(module_name + "." + variable + " = " + assignment)
+                action_init_list.append("Environment." + module_name + "_" + variable + " = " + assignment)
 
             # default initialization for uninitialized variables
             for uninit_v in controlled_variables:
                 action_init_list.append(module_name + "." + uninit_v + " = false")
                 action_init_list.append("Environment." + module_name + "_" + uninit_v + " = false")
 
-            gc_init_list.append("(" + " and ".join(action_init_list) + ")")
+            if gc_idx != 0:
+                yield " or\n"
+            yield "(" + " and ".join(action_init_list) + ")"
+
+        yield ") and "
 
-        module_init_list.append("(" + " or\n".join(gc_init_list) + ")")
-    module_init_list.append("Environment.const_true = true")
-    s += " and ".join(module_init_list) + ";\n"
-    s += "end InitStates\n\n"
-    return s
+    yield "Environment.const_true = true;\n"
+    yield "end InitStates\n\n"
 
-def generate_formulae(result):
+def generate_formulae(ctx):
+    return "".join(iter_formulae(ctx))
+
+def iter_formulae(ctx):
     '''
     Generate the Formulae section.
     '''
-    s = "Formulae\n" + \
-        "    <<ste>> (Environment, ste) (\n" + \
-        "        "
+    result = ctx.result
+    yield "Formulae\n" + \
+          "    <<ste>> (Environment, ste) (\n" + \
+          "        "
 
     for i in range(len(result)):
-        s += "<<st" + str(i) + ">> "
+        yield "<<st" + str(i) + ">> "
 
     for i, module in enumerate(result):
-        s += "(" + module["name"][0] + ", st" + str(i) + ") "
-
-    s += "(\n"
+        yield "(" + module.name + ", st" + str(i) + ") "
 
-    and_list = []
+    yield "(\n"
 
     for i, module in enumerate(result):
-        and_str = "            (([[alt_st" + str(i) + "]] (" + module["name"][0] + ", alt_st" + str(i) + ") !(" + translate_formula(module["goal"]["formula"].asList(), 0, result, -2) + ")) or (" + translate_formula(module["goal"]["formula"].asList(), 0, result, -2) + "))\n"
-        and_list.append(and_str)
+        if i != 0:
+            yield "            and\n"
 
-    s += "            and\n".join(and_list)
+        goal = translate_tree(module.goal, result, -2, ctx.symbols)
+        yield "            (([[alt_st" + str(i) + "]] (" + module.name + ", alt_st" + str(i) + ") !(" + goal + ")) or (" + goal + "))\n"
 
-    s += "        )\n"
-    s += "    );\n" + \
-         "end Formulae"
-    return s
+    yield "        )\n"
+    yield "    );\n" + \
+          "end Formulae"
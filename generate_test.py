@@ -1,6 +1,7 @@
 import unittest
 from generate import *
 from parse import *
+from game import *
 
 class TestGenerator(unittest.TestCase):
     parser = build_propositional_formula_parser()
@@ -32,11 +33,38 @@ class TestGenerator(unittest.TestCase):
         trans_result = translate_formula(result.asList())
         self.assertEqual("!(q and r) or (p)", trans_result)
 
+    def test_translate_formula_precedence(self):
+        a = "p || q && r"
+        result = self.parser.parseString(a)
+        trans_result = translate_formula(result.asList())
+        self.assertEqual("p or (q and r)", trans_result)
+
+        tokens = ["p"]
+        for i in range(5000):
+            tokens.extend(["->", "p"])
+        trans_result = translate_formula(tokens)
+        self.assertEqual("!(p) or (" * 5000 + "p" + ")" * 5000, trans_result)
+
     def test_translate_formula_LTL(self):
         a = "GF(d0 && u1)"
         result = self.parser_LTL.parseString(a)
         trans_result = translate_formula(result.asList())
         self.assertEqual("G F (d0 and u1)", trans_result)
 
+class TestGenerationContext(unittest.TestCase):
+    parser = get_RML_parser()
+
+    def test_repeated_runs(self):
+        with open("RML_examples/bisimilarity_true.rml", "r") as f:
+            result = convert_result(self.parser.parseString(f.read()))
+
+        first = generate_environment(GenerationContext(result))
+        second = generate_environment(GenerationContext(result))
+        self.assertEqual(first, second)
+
+        ctx = GenerationContext(result)
+        self.assertEqual([2, 2, 2, 2, 5], ctx.count_commands_list)
+        self.assertEqual(80, ctx.count_env_protocols)
+
 if __name__ == "__main__":
     unittest.main()
@@ -6,10 +6,15 @@ import argparse
 import pyparsing as pp
 from parse import *
 from verify import *
+from game import *
+from rd_parse import *
+from stream_parse import *
 from generate import *
+from cache import *
+from mcmas import *
+from explicit import *
+from profiling import *
 import os
-import subprocess
-import re
 
 if __name__ == "__main__":
     '''
@@ -17,77 +22,196 @@ if __name__ == "__main__":
     '''
     argparser = argparse.ArgumentParser(description="Parse some command line arguments.")
     argparser.add_argument("input_file")
+    argparser.add_argument("--parser", choices=["pyparsing", "rd"], default="pyparsing",
+                           help="parse with the pyparsing grammar or the hand-written recursive-descent parser")
+    argparser.add_argument("--packrat", action="store_true",
+                           help="enable packrat memoization in the pyparsing grammar, only with --parser pyparsing")
+    argparser.add_argument("--packrat-cache-size", type=int, default=DEFAULT_PACKRAT_CACHE_SIZE,
+                           help="the maximum number of entries in the packrat cache")
+    argparser.add_argument("--stream", action="store_true",
+                           help="read, parse and verify the RML file one module at a time")
+    argparser.add_argument("--jobs", type=int, default=1,
+                           help="the number of processes parsing the modules of the RML file in parallel")
+    argparser.add_argument("--cache-dir",
+                           help="keep the parsed game and the ISPL file in this directory, and reuse them while the RML file is unchanged")
+    argparser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE / (1024 * 1024),
+                           help="the maximum size of the cache directory in MB")
+    add_mcmas_arguments(argparser)
+    add_explicit_arguments(argparser)
+    argparser.add_argument("--profile", metavar="FILE",
+                           help="write the time and memory of each step, and the sizes of the game and the ISPL file, as JSON to FILE")
     args = argparser.parse_args()
     file_path = args.input_file
 
-    with open(file_path, 'r') as f:
-        file_content = f.read()
-
-    '''
-    2. Clean line comments.
-    '''
-    oneLineComment = pp.Literal("#") + pp.SkipTo(pp.lineEnd)
-    comment_positions = []
-    for result, start, end in oneLineComment.scanString(file_content):
-        comment_positions.append((start, end)) # Record start and end positions of each comment line.
-
-    for start, end in reversed(comment_positions):
-        file_content = file_content[:start] + file_content[end:]
-
-    # Now file_content has removed all comments and ready for parsing modules
-
-    '''
-    3. Parse syntax.
-    '''
-    print "Parsing syntax...",
-    RML_file_parser = build_RML_parser()
-    result = RML_file_parser.parseString(file_content)
-    print " done"
+    if args.packrat:
+        if args.parser != "pyparsing":
+            argparser.error("--packrat only applies to --parser pyparsing")
+        enable_packrat(args.packrat_cache_size)
+
+    profiler = PhaseProfiler()
+
+    cache = None
+    result = None
+    cached_ispl = False
+    if args.cache_dir:
+        profiler.begin("look up the cache")
+        cache = DiskCache(args.cache_dir, args.cache_size * 1024 * 1024)
+        with open(file_path, 'r') as f:
+            key = source_key(f)
+        cached_ispl = load_ispl(cache, key, ispl_file_name(file_path))
+        if not cached_ispl:
+            result = load_game(cache, key)
+    cached_game = result is not None
+
+    if cached_ispl:
+        print "Found the ISPL file of this game in the cache."
+    elif cached_game:
+        print "Found the parsed game in the cache."
+        symbols = build_symbol_table(result)
+    elif args.stream:
+        '''
+        1-4. Read, parse and verify the file one module at a time.
+        '''
+        profiler.begin("1-4. read, parse and verify")
+        print "Parsing and verifying syntax one module at a time...",
+        ctx = VerificationContext()
+        with open(file_path, 'r') as f:
+            result = list(iter_verified_modules(f, ctx, args.parser, args.jobs))
+        symbols = ctx.symbols
+        print " done"
+    elif args.jobs > 1:
+        '''
+        1-3. Read the file and parse its modules in parallel.
+        '''
+        profiler.begin("1-3. read and parse")
+        print "Parsing syntax in {} processes...".format(args.jobs),
+        with open(file_path, 'r') as f:
+            result = list(iter_modules(f, args.parser, args.jobs))
+        print " done"
+
+        '''
+        4. Verify semantically.
+        '''
+        profiler.begin("4. verify")
+        print "Verifying syntax validity...",
+        symbols = verify_result(result)
+        print " done"
+    else:
+        profiler.begin("1. read")
+        with open(file_path, 'r') as f:
+            file_content = f.read()
+
+        '''
+        2. Clean line comments.
+        '''
+        profiler.begin("2. strip comments")
+        file_content = strip_comments(file_content)
+
+        # Now file_content has removed all comments and ready for parsing modules
+
+        '''
+        3. Parse syntax.
+        '''
+        profiler.begin("3. parse")
+        print "Parsing syntax...",
+        if args.parser == "rd":
+            result = parse_RML(file_content)
+        else:
+            RML_file_parser = get_RML_parser()
+            result = convert_result(RML_file_parser.parseString(file_content))
+        print " done"
+
+        '''
+        4. Verify semantically.
+        '''
+        profiler.begin("4. verify")
+        print "Verifying syntax validity...",
+        symbols = verify_result(result)
+        print " done"
+
+    if cache is not None and not cached_ispl and not cached_game:
+        profiler.begin("store the game in the cache")
+        store_game(cache, key, result)
 
     '''
-    4. Verify semantically.
+    Check a small game on its explicit state space, and skip MCMAS if it has a
+    Nash Equilibrium. A FALSE may come from a deviation with memory, so it is
+    left to MCMAS, whose deviations are memoryless.
     '''
-    print "Verifying syntax validity...",
-    verify_result(result)
-    print " done"
+    if result is not None and args.explicit_threshold > 0:
+        profiler.begin("check the explicit state space")
+        print "Checking the explicit state space...",
+        try:
+            verdict, explicit_states = check_explicit(result, args.explicit_threshold)
+        except ExplicitUnsupported as e:
+            verdict = None
+            print " left to MCMAS: " + str(e)
+        if verdict is False:
+            print " left to MCMAS: no Nash Equilibrium when deviations may use memory"
+        elif verdict:
+            print " done"
+            profiler.end()
+            if args.profile:
+                profiler.counts.update(game_counts(result))
+                profiler.counts["explicit_states"] = explicit_states
+                profiler.write(args.profile)
+
+            print "Checked the {} reachable states explicitly, the input game does have Nash Equilibrium.".format(explicit_states)
+            raise SystemExit(0)
 
     '''
-    5. Convert RML to generate ISPL file.
+    5. Decide the output ISPL file name.
     '''
-    print "Generating ISPL file for MCMAS..."
-    ispl_result = generate_ispl(result)
-    print " done"
-
+    profiler.begin("5. decide the output file name")
+    output_file_name = ispl_file_name(file_path)
 
     '''
-    6. Output ispl_result
+    6. Convert RML to ISPL, streaming it to the output file section by section.
     '''
-    print "Writing ISPL file to current directory...",
-    input_file_name = os.path.basename(file_path)
-    output_file_name = ""
-
-    if input_file_name.split(".")[-1] == "rml": # input filename ends in .rml
-        output_file_name = ".".join(input_file_name.split(".")[0:-1]) + ".ispl"
-        output_file_name = "./ispl/" + output_file_name
-    else: # input filename does not end in .rml
-
-        output_file_name = "./ispl/" + input_file_name + ".ispl"
-
-    with open(output_file_name, "w") as f:
-        f.write(ispl_result)
-
-    print " done"
+    if not cached_ispl:
+        profiler.begin("6. generate and write the ISPL file")
+        print "Generating ISPL file for MCMAS and writing it to current directory..."
+        with open(output_file_name, "w") as output_file:
+            # timing each write costs two getrusage calls, so only when profiling
+            f = TimedWriter(output_file) if args.profile else output_file
+            write_ispl(result, f, symbols)
+
+        print " done"
+        profiler.end()
+        if args.profile:
+            profiler.phases[-1]["write_wall_time"] = f.wall_time
+            profiler.phases[-1]["write_cpu_time"] = f.cpu_time
+
+        if cache is not None:
+            profiler.begin("store the ISPL file in the cache")
+            store_ispl(cache, key, output_file_name)
 
     '''
     7. Call MCMAS to check the result
     '''
-    mcmas_output = subprocess.check_output(["mcmas", output_file_name])
-    true_pattern = re.compile(".*Formula number 1.*is TRUE in the model.*", re.S)
-    false_pattern = re.compile(".*Formula number 1.*is FALSE in the model.*", re.S)
-
-    if true_pattern.match(mcmas_output):
+    profiler.begin("7. check with MCMAS", children=True)
+    try:
+        verdict, mcmas_output, cached_verdict = check_ispl(output_file_name, verdict_cache_from_args(args), False,
+                                                           args.mcmas_executable, args.mcmas_option,
+                                                           timeout=args.mcmas_timeout, memory_limit=args.mcmas_memory_limit,
+                                                           stop_after=mcmas_stop_after(args))
+    except MCMASTimeout as e:
+        print "ERROR: " + str(e)
+        raise SystemExit(1)
+    finally:
+        # also when MCMAS failed, with the MCMAS step up to the failure
+        if args.profile:
+            if result is not None:
+                profiler.counts.update(game_counts(result))
+            profiler.counts.update(ispl_counts(output_file_name))
+            profiler.write(args.profile)
+
+    if cached_verdict:
+        print "Found the MCMAS verdict of this ISPL file in the cache."
+
+    if verdict is True:
         print "MCMAS checking returned TRUE, the input game does have Nash Equilibrium."
-    elif false_pattern.match(mcmas_output):
+    elif verdict is False:
         print "MCMAS checking returned FALSE, the input game has no Nash Equilibrium."
     else:
         print "ERROR: fail to recognize MCMAS result:"
@@ -0,0 +1,418 @@
+'''
+This module runs MCMAS on a generated ISPL file and reads its verdict.
+Verdicts can be kept in a DiskCache, keyed by the ISPL file, the MCMAS
+executable and its options, since a MCMAS run is by far the slowest step.
+A run can be limited in time and memory, and MCMASRunner keeps several runs
+going at the same time in a pool of threads.
+'''
+import hashlib
+import os
+import Queue
+import re
+import resource
+import signal
+import subprocess
+import threading
+from distutils.spawn import find_executable
+from cache import *
+try:
+    import subprocess32 # a Popen that is safe to call from several threads
+except ImportError:
+    subprocess32 = None
+
+DEFAULT_VERDICT_CACHE_DIR = "./mcmas_cache"
+DEFAULT_VERDICT_CACHE_SIZE = 100 * 1024 * 1024 # bytes
+DEFAULT_VERDICT_CACHE_AGE = 30 * 24 * 60 * 60 # seconds
+
+# A verdict is printed as "  Formula number 1: <formula>, is TRUE in the model",
+# where the formula may span several lines.
+formula_pattern = re.compile(r"\s*Formula number (\d+):")
+verdict_pattern = re.compile(r"is (TRUE|FALSE) in the model\s*$")
+
+def add_mcmas_arguments(argparser):
+    '''
+    Add the command line options of MCMAS and the verdict cache to argparser.
+    '''
+    argparser.add_argument("--mcmas-executable", default="mcmas",
+                           help="the MCMAS executable, e.g. ./fake_mcmas.py to run without MCMAS")
+    argparser.add_argument("--mcmas-option", action="append", default=[],
+                           help="an option passed to MCMAS, may be repeated")
+    argparser.add_argument("--mcmas-timeout", type=float,
+                           help="stop MCMAS after this many seconds")
+    argparser.add_argument("--mcmas-memory-limit", type=int,
+                           help="the maximum address space of MCMAS in MB")
+    argparser.add_argument("--mcmas-full-run", action="store_true",
+                           help="let MCMAS run to the end instead of stopping it at the verdict, e.g. to get its counterexamples")
+    argparser.add_argument("--verdict-cache-dir", default=DEFAULT_VERDICT_CACHE_DIR,
+                           help="keep the MCMAS verdict of each ISPL file in this directory")
+    argparser.add_argument("--verdict-cache-size", type=int, default=DEFAULT_VERDICT_CACHE_SIZE / (1024 * 1024),
+                           help="the maximum size of the verdict cache in MB")
+    argparser.add_argument("--verdict-cache-age", type=int, default=DEFAULT_VERDICT_CACHE_AGE / (24 * 60 * 60),
+                           help="the number of days a verdict is kept after its last use")
+    argparser.add_argument("--no-verdict-cache", action="store_true",
+                           help="always run MCMAS, without reading or writing the verdict cache")
+
+def verdict_cache_from_args(args):
+    '''
+    Return the DiskCache of verdicts configured by the options of
+    add_mcmas_arguments, or None if it is bypassed.
+    '''
+    if args.no_verdict_cache:
+        return None
+    return DiskCache(args.verdict_cache_dir, args.verdict_cache_size * 1024 * 1024,
+                     args.verdict_cache_age * 24 * 60 * 60)
+
+def mcmas_stop_after(args):
+    '''
+    Return the stop_after argument of run_mcmas set by the options of
+    add_mcmas_arguments: the generated ISPL files have a single formula.
+    '''
+    return None if args.mcmas_full_run else 1
+
+class VerdictReader(object):
+    '''
+    Read the output of MCMAS line by line, as it is printed, and record the
+    verdict of each formula.
+    '''
+    def __init__(self):
+        self.lines = []
+        self.verdicts = {} # formula number -> True or False
+        self.formula = None # the number of the formula being printed
+
+    def feed(self, line):
+        self.lines.append(line)
+
+        m = formula_pattern.match(line)
+        if m is not None:
+            self.formula = int(m.group(1))
+
+        if self.formula is not None:
+            m = verdict_pattern.search(line)
+            if m is not None:
+                self.verdicts[self.formula] = m.group(1) == "TRUE"
+                self.formula = None
+
+    def has_verdicts(self, formulas):
+        '''
+        Return whether formulas 1 to formulas all have a verdict.
+        '''
+        return all(i in self.verdicts for i in range(1, formulas + 1))
+
+    def output(self):
+        return "".join(self.lines)
+
+def parse_verdicts(mcmas_output):
+    '''
+    Return the dictionary from formula number to verdict in the output of MCMAS.
+    '''
+    reader = VerdictReader()
+    for line in mcmas_output.splitlines(True):
+        reader.feed(line)
+    return reader.verdicts
+
+def parse_verdict(mcmas_output):
+    '''
+    Return True or False for the verdict on the first formula in the output
+    of MCMAS, or None if there is none.
+    '''
+    return parse_verdicts(mcmas_output).get(1)
+
+def mcmas_identity(executable="mcmas"):
+    '''
+    Return a string identifying the MCMAS executable: its real path, size and
+    modification time, which change when another version is installed.
+    '''
+    path = find_executable(executable)
+    if path is None:
+        raise OSError("MCMAS executable not found: " + executable)
+
+    path = os.path.realpath(path)
+    st = os.stat(path)
+    return "{}:{}:{}".format(path, st.st_size, st.st_mtime)
+
+def verdict_key(ispl_file_name, executable="mcmas", options=()):
+    '''
+    Return the cache key of checking the ISPL file with the given MCMAS
+    executable and options.
+    '''
+    h = hashlib.sha1(mcmas_identity(executable) + "\0" + "\0".join(options) + "\0")
+    with open(ispl_file_name, "rb") as f:
+        for block in iter(lambda: f.read(65536), ""):
+            h.update(block)
+    return "verdict-" + h.hexdigest()
+
+class MCMASTimeout(Exception):
+    '''
+    Raised when MCMAS runs longer than its time limit.
+    '''
+    pass
+
+class MCMASCancelled(Exception):
+    '''
+    Raised when a MCMASJob is cancelled before MCMAS finishes.
+    '''
+    pass
+
+def process_setup(memory_limit):
+    '''
+    Return a function to be run in the MCMAS process before it starts. It puts
+    the process in its own process group, so that kill_process also reaches
+    the children of a wrapper script, and limits its address space to
+    memory_limit MB unless that is None.
+    '''
+    def setup():
+        os.setpgrp()
+        if memory_limit is not None:
+            size = memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    return setup
+
+# The Popen of Python 2.7 is not safe to call from several threads with a
+# preexec_fn: a fork taken while another thread holds a lock can deadlock the
+# child before it runs exec. Without subprocess32, processes are started one
+# at a time.
+popen_lock = threading.Lock()
+
+def start_process(command, preexec_fn):
+    '''
+    Start command with preexec_fn, its standard output and error piped
+    together, and return the Popen object.
+    '''
+    if subprocess32 is not None:
+        return subprocess32.Popen(command, stdout=subprocess32.PIPE, stderr=subprocess32.STDOUT, bufsize=-1,
+                                  preexec_fn=preexec_fn, close_fds=True)
+    with popen_lock:
+        return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=-1,
+                                preexec_fn=preexec_fn, close_fds=True)
+
+def kill_process(process):
+    '''
+    Kill the process group of a process started with process_setup.
+    '''
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass # already exited
+
+def run_mcmas(ispl_file_name, executable="mcmas", options=(), timeout=None, memory_limit=None, job=None,
+              reader=None, stop_after=None):
+    '''
+    Run MCMAS on the ISPL file and return its output.
+    timeout: the maximum number of seconds MCMAS may run, or None
+    memory_limit: the maximum address space of MCMAS in MB, or None; MCMAS
+        fails with a CalledProcessError when it runs out of it
+    job: the MCMASJob to register the process with, so that it can be cancelled
+    reader: the VerdictReader fed with each line of output as it is printed
+    stop_after: stop MCMAS as soon as formulas 1 to stop_after have a verdict,
+        and return the output up to there, or None to let it run to the end
+    '''
+    command = [executable] + list(options) + [ispl_file_name]
+    preexec_fn = process_setup(memory_limit)
+
+    if job is not None:
+        process = job.start(command, preexec_fn)
+    else:
+        process = start_process(command, preexec_fn)
+
+    timed_out = threading.Event()
+    def expire():
+        timed_out.set()
+        kill_process(process)
+
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+    if reader is None:
+        reader = VerdictReader()
+    stopped = False
+    try:
+        for line in iter(process.stdout.readline, ""):
+            reader.feed(line)
+            if stop_after is not None and reader.has_verdicts(stop_after):
+                # skip the rest, such as counterexamples and statistics
+                stopped = True
+                kill_process(process)
+                break
+        process.stdout.close()
+        process.wait()
+    except BaseException:
+        # such as KeyboardInterrupt, which MCMAS does not get in its own process group
+        kill_process(process)
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    mcmas_output = reader.output()
+    if stopped:
+        return mcmas_output
+    if job is not None and job.cancelled:
+        raise MCMASCancelled(ispl_file_name)
+    if timed_out.is_set() and process.returncode != 0:
+        raise MCMASTimeout("MCMAS ran longer than {} s on {}".format(timeout, ispl_file_name))
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command, mcmas_output)
+
+    return mcmas_output
+
+def check_ispl(ispl_file_name, cache=None, refresh=False, executable="mcmas", options=(),
+               timeout=None, memory_limit=None, job=None, stop_after=None):
+    '''
+    Check the ISPL file with MCMAS.
+    cache: a DiskCache of verdicts, or None
+    refresh: run MCMAS even if the verdict is in the cache, and store the new one
+    timeout, memory_limit, job, stop_after: as for run_mcmas
+    Return a (verdict, MCMAS output, whether it came from the cache) tuple,
+    where verdict is the one on the first formula. parse_verdicts gives the
+    verdicts on all formulas in the output.
+    A cached output is only used if it is as complete as the one asked for:
+    a full run serves every stop_after, and a run stopped after formula n
+    serves the runs stopping no later.
+    '''
+    reader = VerdictReader()
+    if cache is None:
+        mcmas_output = run_mcmas(ispl_file_name, executable, options, timeout, memory_limit, job, reader, stop_after)
+        return reader.verdicts.get(1), mcmas_output, False
+
+    key = verdict_key(ispl_file_name, executable, options)
+    if not refresh:
+        entry = cache.get(key)
+        if entry is not None and "stop_after" in entry and \
+                (entry["stop_after"] is None or (stop_after is not None and stop_after <= entry["stop_after"])):
+            return entry["verdict"], entry["output"], True
+
+    mcmas_output = run_mcmas(ispl_file_name, executable, options, timeout, memory_limit, job, reader, stop_after)
+    verdict = reader.verdicts.get(1)
+    if verdict is not None: # do not keep the output of a failed run
+        cache.set(key, {"verdict": verdict, "output": mcmas_output, "stop_after": stop_after})
+
+    return verdict, mcmas_output, False
+
+class MCMASJob(object):
+    '''
+    One ISPL file submitted to a MCMASRunner.
+    '''
+    def __init__(self, ispl_file_name):
+        self.ispl_file_name = ispl_file_name
+        self.process = None
+        self.cancelled = False
+        self.result = None # the tuple returned by check_ispl
+        self.error = None # the exception raised by check_ispl
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def start(self, command, preexec_fn):
+        '''
+        Start the MCMAS process of the job, unless it has been cancelled.
+        '''
+        with self.lock:
+            if self.cancelled:
+                raise MCMASCancelled(self.ispl_file_name)
+            self.process = start_process(command, preexec_fn)
+            return self.process
+
+    def cancel(self):
+        '''
+        Cancel the job: it does not start if it is still waiting, and its MCMAS
+        process is killed if it is running.
+        '''
+        with self.lock:
+            self.cancelled = True
+            if self.process is not None:
+                kill_process(self.process)
+
+    def finish(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished.set()
+
+    def done(self):
+        return self.finished.is_set()
+
+    def wait(self, timeout=None):
+        '''
+        Wait until the job is finished, and return the (verdict, MCMAS output,
+        whether it came from the cache) tuple, or raise the error of the run:
+        MCMASTimeout, MCMASCancelled, subprocess.CalledProcessError or OSError.
+        timeout: the maximum number of seconds to wait, or None
+        Return None if the job is not finished after timeout seconds.
+        '''
+        # Event.wait without a timeout cannot be interrupted by Ctrl-C in Python 2
+        while not self.finished.wait(timeout if timeout is not None else 1):
+            if timeout is not None:
+                return None
+
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class MCMASRunner(object):
+    '''
+    Check ISPL files with at most jobs MCMAS processes running at the same time.
+    The other arguments are passed to check_ispl for every file.
+    '''
+    def __init__(self, jobs, cache=None, executable="mcmas", options=(), timeout=None, memory_limit=None,
+                 stop_after=None):
+        self.cache = cache
+        self.executable = executable
+        self.options = options
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.stop_after = stop_after
+        self.queue = Queue.Queue()
+        self.jobs = []
+        self.lock = threading.Lock()
+        self.threads = [threading.Thread(target=self.work) for i in range(jobs)]
+        for thread in self.threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, ispl_file_name):
+        '''
+        Queue the ISPL file for checking and return its MCMASJob.
+        '''
+        job = MCMASJob(ispl_file_name)
+        with self.lock:
+            self.jobs.append(job)
+        self.queue.put(job)
+        return job
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            try:
+                if job.cancelled:
+                    raise MCMASCancelled(job.ispl_file_name)
+                result = check_ispl(job.ispl_file_name, self.cache, False, self.executable, self.options,
+                                    self.timeout, self.memory_limit, job, self.stop_after)
+            except Exception as e:
+                job.finish(error=e)
+            else:
+                job.finish(result=result)
+
+            with self.lock:
+                self.jobs.remove(job)
+
+    def cancel(self):
+        '''
+        Cancel every job that is waiting or running.
+        '''
+        with self.lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            job.cancel()
+
+    def shutdown(self, cancel=False):
+        '''
+        Stop the threads after the queued jobs are done, or cancel them first.
+        '''
+        if cancel:
+            self.cancel()
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
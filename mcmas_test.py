@@ -0,0 +1,162 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from cache import *
+from generate import *
+from rd_parse import *
+from mcmas import *
+from fake_mcmas import write_stand_in
+
+class TestMCMAS(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        # a stand-in for mcmas, counting its runs
+        self.runs_file = os.path.join(self.directory, "runs")
+        self.executable = write_stand_in(os.path.join(self.directory, "mcmas"),
+                                         "--verdict", "true", "--runs-file", self.runs_file)
+
+        self.ispl_file_name = os.path.join(self.directory, "game.ispl")
+        with open("RML_examples/casino.rml", "r") as f:
+            with open(self.ispl_file_name, "w") as ispl_file:
+                write_ispl(parse_RML(f.read()), ispl_file, verbose=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def runs(self):
+        if not os.path.exists(self.runs_file):
+            return 0
+        with open(self.runs_file, "r") as f:
+            return len(f.readlines())
+
+    def test_parse_verdict(self):
+        self.assertIs(True, parse_verdict("Formula number 1: (<<ste>> ...), is TRUE in the model\n"))
+        self.assertIs(False, parse_verdict("Formula number 1: (<<ste>> ...\n...), is FALSE in the model\n"))
+        self.assertIsNone(parse_verdict("Error: syntax error in line 3\n"))
+        self.assertIsNone(parse_verdict("Formula number 10: (x), is TRUE in the model\n"))
+
+        output = ("Verifying properties...\n"
+                  "  Formula number 1: (AG x), is TRUE in the model\n"
+                  "  Formula number 2: (EF (x\n"
+                  "and y)), is FALSE in the model\n"
+                  "  The following is a counterexample for the formula: \n")
+        self.assertEqual({1: True, 2: False}, parse_verdicts(output))
+
+    def test_verdict_cache(self):
+        cache = DiskCache(os.path.join(self.directory, "cache"))
+        self.assertEqual((True, False), check_ispl(self.ispl_file_name, cache, executable=self.executable)[::2])
+        self.assertEqual((True, True), check_ispl(self.ispl_file_name, cache, executable=self.executable)[::2])
+        self.assertEqual(1, self.runs())
+
+        # other options, another ISPL file, or no cache at all
+        check_ispl(self.ispl_file_name, cache, executable=self.executable, options=["--delay", "0"])
+        self.assertEqual(2, self.runs())
+        with open(self.ispl_file_name, "a") as f:
+            f.write("-- another game\n")
+        check_ispl(self.ispl_file_name, cache, executable=self.executable)
+        self.assertEqual(3, self.runs())
+        check_ispl(self.ispl_file_name, None, executable=self.executable)
+        self.assertEqual(4, self.runs())
+
+        # refresh runs MCMAS again
+        self.assertEqual((True, False), check_ispl(self.ispl_file_name, cache, True, self.executable)[::2])
+        self.assertEqual(5, self.runs())
+
+    def test_verdict_cache_stop_after(self):
+        cache = DiskCache(os.path.join(self.directory, "cache"))
+        self.assertEqual((True, False), check_ispl(self.ispl_file_name, cache, executable=self.executable,
+                                                   stop_after=1)[::2])
+        # the output of an early stop is truncated, so a full run does not use it
+        verdict, mcmas_output, cached = check_ispl(self.ispl_file_name, cache, executable=self.executable)
+        self.assertEqual((True, False), (verdict, cached))
+        self.assertIn("successfully read and checked", mcmas_output)
+        self.assertEqual(2, self.runs())
+
+        # the full run serves both
+        self.assertEqual((True, True), check_ispl(self.ispl_file_name, cache, executable=self.executable)[::2])
+        self.assertEqual((True, True), check_ispl(self.ispl_file_name, cache, executable=self.executable,
+                                                  stop_after=1)[::2])
+        self.assertEqual(2, self.runs())
+
+    def test_stop_after(self):
+        # a stand-in for mcmas printing a long counterexample after the verdict
+        executable = write_stand_in(os.path.join(self.directory, "verbose"), "--verdict", "false",
+                                    "--output-size", str(1024 * 1024 * 1024))
+
+        start = time.time()
+        verdict, mcmas_output, cached = check_ispl(self.ispl_file_name, executable=executable, stop_after=1)
+        self.assertLess(time.time() - start, 5)
+        self.assertIs(False, verdict)
+        self.assertNotIn("successfully read and checked", mcmas_output)
+
+class TestMCMASRunner(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        # a stand-in for mcmas, which sleeps for the number of seconds in the ISPL file
+        self.executable = os.path.join(self.directory, "mcmas")
+        with open(self.executable, "w") as f:
+            f.write("#!/bin/sh\n"
+                    "sleep `cat \"$1\"`\n"
+                    "echo \"  Formula number 1: (...), is FALSE in the model\"\n")
+        os.chmod(self.executable, 0755)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def ispl_file(self, name, seconds):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(str(seconds))
+        return path
+
+    def test_concurrent(self):
+        runner = MCMASRunner(3, executable=self.executable)
+        start = time.time()
+        jobs = [runner.submit(self.ispl_file("g{}.ispl".format(i), 0.5)) for i in range(3)]
+        for job in jobs:
+            self.assertIs(False, job.wait()[0])
+        self.assertLess(time.time() - start, 1.2)
+        runner.shutdown()
+
+    def test_concurrent_starts(self):
+        # many processes started at the same time from threads, each with a preexec_fn
+        runner = MCMASRunner(8, executable=self.executable, memory_limit=256)
+        jobs = [runner.submit(self.ispl_file("g{}.ispl".format(i), 0)) for i in range(32)]
+        for job in jobs:
+            self.assertIs(False, job.wait(10)[0])
+        runner.shutdown()
+
+    def test_timeout(self):
+        start = time.time()
+        self.assertRaises(MCMASTimeout, check_ispl, self.ispl_file("slow.ispl", 10), executable=self.executable, timeout=0.2)
+        self.assertLess(time.time() - start, 5)
+        self.assertIs(False, check_ispl(self.ispl_file("fast.ispl", 0), executable=self.executable, timeout=5)[0])
+
+    def test_memory_limit(self):
+        executable = os.path.join(self.directory, "greedy")
+        with open(executable, "w") as f:
+            f.write("#!" + sys.executable + "\nx = ' ' * (200 * 1024 * 1024)\n")
+        os.chmod(executable, 0755)
+        self.assertRaises(subprocess.CalledProcessError, run_mcmas, self.ispl_file("g.ispl", 0), executable, memory_limit=64)
+
+    def test_cancel(self):
+        runner = MCMASRunner(1, executable=self.executable)
+        running = runner.submit(self.ispl_file("slow.ispl", 10))
+        waiting = runner.submit(self.ispl_file("fast.ispl", 0))
+        time.sleep(0.2)
+        self.assertIsNone(running.wait(0.1))
+
+        start = time.time()
+        runner.shutdown(cancel=True)
+        self.assertLess(time.time() - start, 5)
+        self.assertRaises(MCMASCancelled, running.wait)
+        self.assertRaises(MCMASCancelled, waiting.wait)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+'''
+This module is the in-process API of the tool: check_nash_equilibrium runs
+the steps of main.py on the text of a RML file and returns their results,
+without printing anything. The grammar is built once per process, so
+repeated calls from a long-running process only pay for the game itself.
+Games with few reachable states may first be checked by explicit.py, and only
+go to MCMAS when it does not find a Nash Equilibrium.
+'''
+import os
+import tempfile
+import time
+from parse import *
+from verify import *
+from game import *
+from rd_parse import *
+from generate import *
+from mcmas import *
+from explicit import *
+
+class CheckOptions(object):
+    '''
+    The options of check_nash_equilibrium, with the same defaults as main.py.
+    '''
+    def __init__(self, parser="pyparsing", ispl_file_name=None, mcmas=True,
+                 executable="mcmas", mcmas_options=(), timeout=None, memory_limit=None, stop_after=1,
+                 verdict_cache=None, explicit_threshold=DEFAULT_EXPLICIT_THRESHOLD):
+        self.parser = parser # "pyparsing" or "rd"
+        self.ispl_file_name = ispl_file_name # where to write the ISPL file, or None for a temporary file
+        self.mcmas = mcmas # if False, stop after generating the ISPL file
+        self.executable = executable
+        self.mcmas_options = mcmas_options
+        self.timeout = timeout # seconds
+        self.memory_limit = memory_limit # MB
+        self.stop_after = stop_after # see run_mcmas
+        self.verdict_cache = verdict_cache # a DiskCache, or None
+        self.explicit_threshold = explicit_threshold # reachable states checked before MCMAS, 0 for none
+
+class CheckResult(object):
+    '''
+    The result of check_nash_equilibrium.
+    '''
+    def __init__(self):
+        self.modules = None # the list of Module
+        self.ispl = None # the text of the ISPL file
+        self.ispl_file_name = None # the path of the ISPL file, if kept
+        self.verdict = None # True if the game has a Nash Equilibrium, False if not, None if unknown
+        self.verdicts = {} # formula number -> verdict, for each formula in the MCMAS output
+        self.mcmas_output = None
+        self.cached_verdict = False # whether the verdict came from the verdict cache
+        self.explicit_states = None # the number of reachable states, if found TRUE without MCMAS
+        self.timings = {} # step name -> wall time in seconds
+
+    def summary(self):
+        '''
+        Return the result without the modules and texts, as a dictionary that
+        can be written as JSON.
+        '''
+        return {"modules": len(self.modules) if self.modules is not None else None,
+                "ispl_file": self.ispl_file_name,
+                "ispl_size": len(self.ispl) if self.ispl is not None else None,
+                "verdict": self.verdict,
+                "cached_verdict": self.cached_verdict,
+                "explicit_states": self.explicit_states,
+                "timings": self.timings}
+
+def parse_game(rml_text, parser="pyparsing"):
+    '''
+    Parse the text of a RML file, comments included, and return a list of Module.
+    '''
+    if parser == "rd":
+        return parse_RML(rml_text)
+    else:
+        return convert_result(get_RML_parser().parseString(strip_comments(rml_text)))
+
+def check_nash_equilibrium(rml_text, options=None):
+    '''
+    Decide whether the game in the text of a RML file has a Nash Equilibrium.
+    options: a CheckOptions, or None for the defaults
+    Return a CheckResult, without ISPL text when the game was checked
+    explicitly. Errors are raised as by the steps of main.py:
+    pyparsing.ParseException for an invalid game, and OSError,
+    subprocess.CalledProcessError or MCMASTimeout when MCMAS fails.
+    '''
+    if options is None:
+        options = CheckOptions()
+    result = CheckResult()
+    timings = result.timings
+
+    start = time.time()
+    result.modules = parse_game(rml_text, options.parser)
+    timings["parse"] = time.time() - start
+
+    start = time.time()
+    symbols = verify_result(result.modules)
+    timings["verify"] = time.time() - start
+
+    if options.mcmas and options.explicit_threshold > 0:
+        start = time.time()
+        try:
+            verdict, explicit_states = check_explicit(result.modules, options.explicit_threshold)
+        except ExplicitUnsupported:
+            verdict = None
+        timings["explicit"] = time.time() - start
+        # a FALSE may come from a deviation with memory, which MCMAS does not consider
+        if verdict:
+            result.verdict, result.explicit_states = verdict, explicit_states
+            return result
+
+    start = time.time()
+    result.ispl = generate_ispl(result.modules, symbols, verbose=False)
+    temporary = options.ispl_file_name is None
+    if not temporary:
+        result.ispl_file_name = options.ispl_file_name
+        with open(options.ispl_file_name, "w") as f:
+            f.write(result.ispl)
+    timings["generate"] = time.time() - start
+
+    if not options.mcmas:
+        return result
+
+    start = time.time()
+    if temporary:
+        fd, ispl_file_name = tempfile.mkstemp(suffix=".ispl")
+        with os.fdopen(fd, "w") as f:
+            f.write(result.ispl)
+    else:
+        ispl_file_name = options.ispl_file_name
+    try:
+        result.verdict, result.mcmas_output, result.cached_verdict = check_ispl(
+            ispl_file_name, options.verdict_cache, False, options.executable, options.mcmas_options,
+            options.timeout, options.memory_limit, stop_after=options.stop_after)
+    finally:
+        if temporary:
+            os.remove(ispl_file_name)
+    result.verdicts = parse_verdicts(result.mcmas_output)
+    timings["mcmas"] = time.time() - start
+
+    return result
@@ -0,0 +1,83 @@
+import os
+import shutil
+import StringIO
+import sys
+import tempfile
+import unittest
+import pyparsing as pp
+from generate import *
+from rd_parse import *
+from nash import *
+from fake_mcmas import write_stand_in
+from explicit_test import matching_pennies_text
+
+class TestCheckNashEquilibrium(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.executable = write_stand_in(os.path.join(self.directory, "mcmas"), "--verdict", "true")
+
+        with open("RML_examples/casino.rml", "r") as f:
+            self.rml_text = f.read()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_without_mcmas(self):
+        for parser in ["pyparsing", "rd"]:
+            result = check_nash_equilibrium(self.rml_text, CheckOptions(parser=parser, mcmas=False))
+            self.assertEqual(generate_ispl(parse_RML(self.rml_text), verbose=False), result.ispl)
+            self.assertIsNone(result.verdict)
+            self.assertIsNone(result.ispl_file_name)
+            self.assertEqual(["generate", "parse", "verify"], sorted(result.timings))
+
+    def test_with_mcmas(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            for parser in ["pyparsing", "rd"]:
+                result = check_nash_equilibrium(self.rml_text, CheckOptions(parser=parser, executable=self.executable,
+                                                                            explicit_threshold=0))
+                self.assertIs(True, result.verdict)
+                self.assertEqual({1: True}, result.verdicts)
+            printed = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual("", printed)
+
+        ispl_file_name = os.path.join(self.directory, "casino.ispl")
+        result = check_nash_equilibrium(self.rml_text, CheckOptions(ispl_file_name=ispl_file_name, executable=self.executable,
+                                                                    explicit_threshold=0))
+        with open(ispl_file_name, "r") as f:
+            self.assertEqual(result.ispl, f.read())
+
+    def test_explicit(self):
+        with open("RML_examples/peer_to_peer_communication.rml", "r") as f:
+            rml_text = f.read()
+        result = check_nash_equilibrium(rml_text, CheckOptions(executable="/nonexistent/mcmas"))
+        self.assertIs(True, result.verdict)
+        self.assertEqual(4, result.explicit_states)
+        self.assertIsNone(result.ispl)
+        self.assertEqual(["explicit", "parse", "verify"], sorted(result.timings))
+
+        # the Player skips on the turn of the Casino
+        result = check_nash_equilibrium(self.rml_text, CheckOptions(executable="/nonexistent/mcmas"))
+        self.assertIs(True, result.verdict)
+        self.assertEqual(16, result.explicit_states)
+
+        # turned off
+        result = check_nash_equilibrium(rml_text, CheckOptions(executable=self.executable, explicit_threshold=0))
+        self.assertIsNone(result.explicit_states)
+        self.assertEqual(["generate", "mcmas", "parse", "verify"], sorted(result.timings))
+
+        # no Nash Equilibrium when deviations may use memory, left to MCMAS
+        rml_text = matching_pennies_text("X G ((a -> b) && (b -> a))", "X G !((a -> b) && (b -> a))")
+        result = check_nash_equilibrium(rml_text, CheckOptions(executable=self.executable))
+        self.assertIs(True, result.verdict)
+        self.assertIsNone(result.explicit_states)
+        self.assertEqual(["explicit", "generate", "mcmas", "parse", "verify"], sorted(result.timings))
+
+    def test_invalid_game(self):
+        self.assertRaises(pp.ParseException, check_nash_equilibrium, self.rml_text.replace(":=", "="))
+
+if __name__ == "__main__":
+    unittest.main()
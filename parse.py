@@ -2,6 +2,8 @@
 '''
 This module will read in the RML file and parse it using the pyparsing library.
 '''
+import re
+import threading
 import pyparsing as pp
 
 # Define parsers for literals
@@ -18,68 +20,39 @@ def build_identifier_parser():
     identifier_parser = ~boolean_literal + pp.Word(initial_letters, body_letters)
     return identifier_parser
 
-def build_propositional_formula_parser():
+def build_formula_parser(unary_ops, binary_ops):
     '''
-    Return a parser for parsing propositional_formula.
+    Return a parser for formulas over identifiers with the given operators.
     '''
-    identifier_set = set([])
-
-    def record_identifiers(t):
-        identifier_set.add(t[0])
-        return t
-
     identifier = build_identifier_parser()
-    identifier.setParseAction(record_identifiers)
-    unary_op = pp.Literal('!')
-    binary_op = pp.oneOf("&& || ->")
+    unary_op = pp.oneOf(unary_ops)
+    binary_op = pp.oneOf(binary_ops)
     lpar = pp.Literal('(').suppress()
     rpar = pp.Literal(')').suppress()
 
     expr = pp.Forward()
 
-    atom = boolean_literal \
-         | identifier \
-         | unary_op + expr \
-         | pp.Group(lpar + expr + rpar)
+    # Chains of operators are matched by loops, not recursion, so only the
+    # parentheses nest; build_formula_tree resolves the precedence.
+    atom = pp.ZeroOrMore(unary_op) \
+         + (boolean_literal
+            | identifier
+            | pp.Group(lpar + expr + rpar))
 
-    def add_identifiers_to_result(t):
-        t["identifiers"] = identifier_set
-
-    expr << atom + pp.ZeroOrMore(binary_op + expr)
-    expr.setParseAction(add_identifiers_to_result)
+    expr << atom + pp.ZeroOrMore(binary_op + atom)
     return expr
 
+def build_propositional_formula_parser():
+    '''
+    Return a parser for parsing propositional_formula.
+    '''
+    return build_formula_parser("!", "&& || ->")
+
 def build_LTL_formula_parser():
     '''
     Return a parser for parsing LTL formula.
     '''
-    identifier_set = set([])
-
-    def record_identifiers(t):
-        identifier_set.add(t[0])
-        return t
-
-    identifier = build_identifier_parser()
-    identifier.setParseAction(record_identifiers)
-
-    unary_op = pp.oneOf("X F G !")
-    binary_op = pp.oneOf("U && || ->")
-    lpar = pp.Literal('(').suppress()
-    rpar = pp.Literal(')').suppress()
-
-    expr = pp.Forward()
-
-    atom = boolean_literal \
-         | identifier \
-         | unary_op + expr \
-         | pp.Group(lpar + expr + rpar)
-
-    def add_identifiers_to_result(t):
-        t["identifiers"] = identifier_set
-
-    expr << atom + pp.ZeroOrMore(binary_op + expr)
-    expr.setParseAction(add_identifiers_to_result)
-    return expr
+    return build_formula_parser("X F G !", "U && || ->")
 
 def build_guarded_command_parser():
     '''
@@ -88,21 +61,9 @@ def build_guarded_command_parser():
     # condition
     condition = build_propositional_formula_parser()
 
-    def add_condition_variables(t):
-        t["condition_variables"] = t["identifiers"]
-        return t
-
-    condition.addParseAction(add_condition_variables)
-
     # action
     assignment = build_propositional_formula_parser()
 
-    def add_assignment_variables(t):
-        t["assignment_variables"] = t["identifiers"]
-        return t
-
-    assignment.addParseAction(add_assignment_variables)
-
     action = build_identifier_parser()("assigned_variable") + pp.Literal(":=") + assignment("assignment")
 
     # action list
@@ -116,9 +77,9 @@ def build_guarded_command_parser():
 
     return guarded_command
 
-def build_RML_parser():
+def build_module_parser():
     '''
-    Return the complete parser for parsing a RML module file.
+    Return the parser for parsing a single RML module.
     '''
     module_name = build_identifier_parser()
     variable = build_identifier_parser()
@@ -133,11 +94,6 @@ def build_RML_parser():
 
     # goal-part
     goal = pp.Keyword("goal").suppress() + LTL_formula("formula")
-    def add_goal_variables(t):
-        t["variables"] = t["identifiers"]
-        return t
-
-    goal.addParseAction(add_goal_variables)
 
     # module-body
     module_body = init("init") + update("update") + goal("goal")
@@ -153,7 +109,75 @@ def build_RML_parser():
              + module_body \
              + pp.Keyword("end module").suppress()
 
+    return module
+
+def build_RML_parser():
+    '''
+    Return the complete parser for parsing a RML module file.
+    '''
+    module = build_module_parser()
+
     # RML_file
     RML_file = pp.OneOrMore(pp.Group(module))
 
     return RML_file
+
+# The shared parsers, built on first use by get_shared_parser()
+_shared_parsers = {}
+_shared_parsers_lock = threading.Lock()
+
+def get_shared_parser(build_parser):
+    '''
+    Return the shared parser built by the function build_parser, building it on first use.
+    The grammar is built and streamlined once per process, under a lock, so
+    concurrent first calls still build it only once. The grammar has no parse
+    actions, whose number of arguments pyparsing 2 finds on their first calls
+    by changing their state, and pyparsing does not otherwise modify the
+    grammar while parsing, so the same parser can be used by several threads
+    at once.
+    '''
+    parser = _shared_parsers.get(build_parser)
+    if parser is None:
+        with _shared_parsers_lock:
+            parser = _shared_parsers.get(build_parser)
+            if parser is None:
+                parser = build_parser()
+                parser.streamline()
+                _shared_parsers[build_parser] = parser
+
+    return parser
+
+def get_RML_parser():
+    '''
+    Return the shared parser for parsing a RML module file.
+    '''
+    return get_shared_parser(build_RML_parser)
+
+def get_module_parser():
+    '''
+    Return the shared parser for parsing a single RML module.
+    '''
+    return get_shared_parser(build_module_parser)
+
+# The default number of entries kept by the packrat cache
+DEFAULT_PACKRAT_CACHE_SIZE = 1024
+
+def enable_packrat(cache_size=DEFAULT_PACKRAT_CACHE_SIZE):
+    '''
+    Turn on packrat memoization for all pyparsing parsers in this process, so a
+    sub-formula that is tried again at the same position is not parsed again.
+    The cache keeps at most cache_size entries and is cleared before each parse.
+    It is shared by all threads, under pyparsing's lock. pyparsing only honours
+    the first call, and packrat cannot be turned off again.
+    '''
+    pp.ParserElement.enablePackrat(cache_size)
+
+# A line comment runs from '#' up to, but not including, the line break
+comment_pattern = re.compile(r"#[^\n]*")
+
+def strip_comments(file_content):
+    '''
+    Return file_content with all line comments removed, in a single pass.
+    The line breaks are kept, so line numbers in error messages are unchanged.
+    '''
+    return comment_pattern.sub("", file_content)
@@ -1,4 +1,5 @@
 import pyparsing as pp
+import threading
 import unittest
 from parse import *
 
@@ -156,8 +157,17 @@ class TestGuardedCommand(unittest.TestCase):
         d = "[] True ~> u1 := True, d1 := False"
         self.assertEqual(["[]", "True", "~>", ["u1", ":=", "True"], ["d1", ":=", "False"]], self.parser.parseString(d).asList())
 
+class TestComments(unittest.TestCase):
+
+    def test_strip_comments(self):
+        a = "module m controls x # comment\n# whole line\n    init\n#"
+        self.assertEqual("module m controls x \n\n    init\n", strip_comments(a))
+
+        b = "[] x ~> x := False"
+        self.assertEqual(b, strip_comments(b))
+
 class TestRMLFile(unittest.TestCase):
-    parser = build_RML_parser()
+    parser = get_RML_parser()
 
     def test_toggle(self):
         example = """
@@ -198,5 +208,26 @@ endmodule
 """
         # print self.parser.parseString(example)[0]["update"][0]["condition_part"]
 
+class TestSharedParser(unittest.TestCase):
+    def test_concurrent_first_parses(self):
+        # a builder of its own, so that the parser is built by the threads
+        def build_parser():
+            return build_RML_parser()
+
+        with open("RML_examples/casino.rml", "r") as f:
+            example = strip_comments(f.read())
+        expected = build_RML_parser().parseString(example).asList()
+        results = []
+        def parse():
+            results.append(get_shared_parser(build_parser).parseString(example).asList())
+
+        threads = [threading.Thread(target=parse) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([expected] * 8, results)
+        self.assertIs(get_shared_parser(build_parser), get_shared_parser(build_parser))
+
 if __name__ == "__main__":
     unittest.main()
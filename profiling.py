@@ -0,0 +1,143 @@
+'''
+This module measures the steps of main.py for the --profile report.
+Each step records its wall time, the CPU time of the tool, and the peak
+resident memory of the process (ru_maxrss) when it ends, together with how
+much the step raised that peak. The MCMAS step also records the CPU time and
+peak memory of the MCMAS process.
+'''
+import json
+import resource
+import time
+from formula import *
+
+def cpu_time(who=resource.RUSAGE_SELF):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+def max_rss(who=resource.RUSAGE_SELF):
+    '''
+    Return the peak resident memory in KB (ru_maxrss is in KB on Linux).
+    '''
+    return resource.getrusage(who).ru_maxrss
+
+class PhaseProfiler(object):
+    '''
+    Record the steps one after the other: begin starts a step and ends the
+    previous one.
+    '''
+    def __init__(self):
+        self.phases = [] # a dictionary per step, in order
+        self.current = None
+        self.counts = {}
+
+    def begin(self, name, children=False):
+        '''
+        Start the step name. children: also measure the child processes
+        waited for during the step, such as MCMAS.
+        '''
+        self.end()
+        self.current = {"name": name,
+                        "wall_start": time.time(),
+                        "cpu_start": cpu_time(),
+                        "max_rss_start": max_rss()}
+        if children:
+            self.current["child_cpu_start"] = cpu_time(resource.RUSAGE_CHILDREN)
+            self.current["child_max_rss_start"] = max_rss(resource.RUSAGE_CHILDREN)
+
+    def end(self):
+        '''
+        End the current step, if any.
+        The peak memory of the child processes is that of the largest child
+        waited for so far, such as a worker of the '--jobs' parsing pool. So
+        it is only reported when it rose during the step, which means the
+        largest child is one of the step.
+        '''
+        if self.current is None:
+            return
+
+        phase = self.current
+        self.current = None
+        peak = max_rss()
+        record = {"name": phase["name"],
+                  "wall_time": time.time() - phase["wall_start"],
+                  "cpu_time": cpu_time() - phase["cpu_start"],
+                  "max_rss_kb": peak,
+                  "max_rss_growth_kb": peak - phase["max_rss_start"]}
+        if "child_cpu_start" in phase:
+            record["child_cpu_time"] = cpu_time(resource.RUSAGE_CHILDREN) - phase["child_cpu_start"]
+            child_peak = max_rss(resource.RUSAGE_CHILDREN)
+            if child_peak > phase["child_max_rss_start"]:
+                record["child_max_rss_kb"] = child_peak
+        self.phases.append(record)
+
+    def report(self):
+        self.end()
+        return {"phases": self.phases,
+                "total_wall_time": sum(phase["wall_time"] for phase in self.phases),
+                "counts": self.counts}
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=4, sort_keys=True)
+            f.write("\n")
+
+class TimedWriter(object):
+    '''
+    A file-like object writing to f, which adds up the wall and CPU time
+    spent in write.
+    '''
+    def __init__(self, f):
+        self.f = f
+        self.size = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+
+    def write(self, s):
+        wall_start = time.time()
+        cpu_start = cpu_time()
+        self.f.write(s)
+        self.wall_time += time.time() - wall_start
+        self.cpu_time += cpu_time() - cpu_start
+        self.size += len(s)
+
+def game_counts(result):
+    '''
+    Return the size counts of a list of Module.
+    '''
+    commands = [gc for m in result for gc in m.init + m.update]
+    return {"modules": len(result),
+            "variables": sum(len(m.variables) for m in result),
+            "init_commands": sum(len(m.init) for m in result),
+            "update_commands": sum(len(m.update) for m in result),
+            "command_formula_size": sum(tree_size(gc.condition) + sum(tree_size(a.formula) for a in gc.actions)
+                                        for gc in commands),
+            "goal_sizes": [tree_size(m.goal) if m.goal is not None else 0 for m in result]}
+
+def ispl_counts(ispl_file_name):
+    '''
+    Return the size counts of an ISPL file: its size in bytes, the number of
+    Evolution lines of all agents, and of the Environment agent alone.
+    '''
+    size = 0
+    evolution_lines = 0
+    environment_evolution_lines = 0
+    agent = None
+    in_evolution = False
+    with open(ispl_file_name, "r") as f:
+        for line in f:
+            size += len(line)
+            stripped = line.strip()
+            if stripped.startswith("Agent "):
+                agent = stripped[len("Agent "):]
+            elif stripped == "Evolution:":
+                in_evolution = True
+            elif stripped == "end Evolution":
+                in_evolution = False
+            elif in_evolution and stripped:
+                evolution_lines += 1
+                if agent == "Environment":
+                    environment_evolution_lines += 1
+
+    return {"ispl_bytes": size,
+            "evolution_lines": evolution_lines,
+            "environment_evolution_lines": environment_evolution_lines}
@@ -0,0 +1,61 @@
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from generate import *
+from rd_parse import *
+from profiling import *
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        with open("RML_examples/casino.rml", "r") as f:
+            self.result = parse_RML(f.read())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_profiler(self):
+        profiler = PhaseProfiler()
+        profiler.begin("1. a")
+        profiler.begin("2. b", children=True)
+        report = profiler.report()
+        self.assertEqual(["1. a", "2. b"], [phase["name"] for phase in report["phases"]])
+        self.assertNotIn("child_cpu_time", report["phases"][0])
+        self.assertIn("child_cpu_time", report["phases"][1])
+        self.assertGreater(report["phases"][1]["max_rss_kb"], 0)
+
+    def test_child_max_rss(self):
+        # KB, above the peak of any child waited for by the earlier tests
+        size = max_rss(resource.RUSAGE_CHILDREN) + 64 * 1024
+        profiler = PhaseProfiler()
+        profiler.begin("1. large child", children=True)
+        subprocess.check_call([sys.executable, "-c", "x = ' ' * ({} * 1024)".format(size)])
+        profiler.begin("2. small child", children=True)
+        subprocess.check_call(["true"])
+        report = profiler.report()
+        self.assertGreater(report["phases"][0]["child_max_rss_kb"], size)
+        # the peak of the children is still the one of the first step
+        self.assertNotIn("child_max_rss_kb", report["phases"][1])
+
+    def test_counts(self):
+        counts = game_counts(self.result)
+        self.assertEqual(2, counts["modules"])
+        self.assertEqual(3, counts["variables"])
+        self.assertEqual(5, counts["update_commands"])
+
+        ispl_file_name = os.path.join(self.directory, "casino.ispl")
+        with open(ispl_file_name, "w") as f:
+            writer = TimedWriter(f)
+            write_ispl(self.result, writer, verbose=False)
+        counts = ispl_counts(ispl_file_name)
+        self.assertEqual(os.path.getsize(ispl_file_name), counts["ispl_bytes"])
+        self.assertEqual(writer.size, counts["ispl_bytes"])
+        self.assertEqual(6, counts["environment_evolution_lines"])
+        self.assertEqual(6 + 3 + 2, counts["evolution_lines"])
+
+if __name__ == "__main__":
+    unittest.main()
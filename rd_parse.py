@@ -0,0 +1,184 @@
+'''
+This module parses RML files with a hand-written recursive-descent parser.
+It accepts the same SRML grammar as build_RML_parser in parse.py, but builds
+the Module objects of game.py directly, without going through pyparsing.
+Differences from the pyparsing parser:
+    - line comments are skipped as whitespace, so strip_comments is not needed;
+    - text after the last module must be empty, instead of being silently ignored.
+'''
+import re
+from pyparsing import ParseException
+from game import *
+
+# Whitespace and line comments between tokens
+skip_pattern = re.compile(r"(?:[ \t\r\n]+|#[^\n]*)*")
+
+# Identifiers ::= <alphas> <alphanum>*, first letter not X F G, other letters not U
+identifier_pattern = re.compile(r"[a-zA-EH-WYZ_][a-zA-TV-Z_0-9]*")
+
+# Characters that may not directly follow a keyword, as for pyparsing.Keyword
+keyword_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$")
+
+propositional_unary_ops = "!"
+propositional_binary_ops = ("&&", "||", "->")
+LTL_unary_ops = "XFG!"
+LTL_binary_ops = ("U", "&&", "||", "->")
+
+class RMLParser(object):
+    '''
+    A recursive-descent parser over one RML text.
+    Each method parses one rule of the grammar starting at self.pos.
+    '''
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+
+    def error(self, message):
+        raise ParseException(self.text, self.pos, message)
+
+    def skip(self):
+        self.pos = skip_pattern.match(self.text, self.pos).end()
+
+    def at_literal(self, literal):
+        self.skip()
+        return self.text.startswith(literal, self.pos)
+
+    def expect_literal(self, literal):
+        if not self.at_literal(literal):
+            self.error("Expected \"" + literal + "\"")
+        self.pos += len(literal)
+
+    def at_keyword(self, keyword):
+        self.skip()
+        end = self.pos + len(keyword)
+        return self.text.startswith(keyword, self.pos) and (end == len(self.text) or self.text[end] not in keyword_chars)
+
+    def expect_keyword(self, keyword):
+        if not self.at_keyword(keyword):
+            self.error("Expected \"" + keyword + "\"")
+        self.pos += len(keyword)
+
+    def identifier(self):
+        if self.at_keyword("True") or self.at_keyword("False"):
+            self.error("Expected identifier, found boolean literal")
+
+        m = identifier_pattern.match(self.text, self.pos)
+        if m is None:
+            self.error("Expected identifier")
+
+        self.pos = m.end()
+        return m.group()
+
+    def formula(self, unary_ops, binary_ops):
+        '''
+        formula ::= atom (binary_op formula)*
+        atom ::= boolean_literal | identifier | unary_op formula | '(' formula ')'
+        Return the flat list of tokens, with a nested list for each parenthesised
+        sub-formula, exactly as the pyparsing grammar does.
+        '''
+        tokens = []
+        while True:
+            # unary operators in front of the atom
+            self.skip()
+            while self.pos < len(self.text) and self.text[self.pos] in unary_ops:
+                tokens.append(self.text[self.pos])
+                self.pos += 1
+                self.skip()
+
+            if self.at_keyword("True"):
+                tokens.append("True")
+                self.pos += 4
+            elif self.at_keyword("False"):
+                tokens.append("False")
+                self.pos += 5
+            elif self.at_literal("("):
+                self.pos += 1
+                tokens.append(self.formula(unary_ops, binary_ops))
+                self.expect_literal(")")
+            else:
+                tokens.append(self.identifier())
+
+            self.skip()
+            for op in binary_ops:
+                if self.text.startswith(op, self.pos):
+                    tokens.append(op)
+                    self.pos += len(op)
+                    break
+            else:
+                return tokens
+
+    def guarded_command(self):
+        '''
+        guarded_command ::= '[]' condition '~>' action (',' action)*
+        action ::= identifier ':=' formula
+        '''
+        self.expect_literal("[]")
+        condition, condition_variables = formula_from_tokens(self.formula(propositional_unary_ops, propositional_binary_ops))
+        self.expect_literal("~>")
+
+        actions = []
+        while True:
+            variable = intern(self.identifier())
+            self.expect_literal(":=")
+            formula, variables = formula_from_tokens(self.formula(propositional_unary_ops, propositional_binary_ops))
+            actions.append(Assignment(variable, formula, variables))
+
+            if not self.at_literal(","):
+                break
+            self.pos += 1
+
+        return GuardedCommand(condition, condition_variables, tuple(actions))
+
+    def guarded_commands(self):
+        commands = [self.guarded_command()]
+        while self.at_literal("[]"):
+            commands.append(self.guarded_command())
+        return tuple(commands)
+
+    def module(self):
+        '''
+        module ::= 'module' name 'controls' variable (',' variable)*
+                   'init' guarded_command+ 'update' guarded_command+ 'goal' LTL_formula
+                   'end module'
+        '''
+        self.expect_keyword("module")
+        name = intern(self.identifier())
+
+        self.expect_keyword("controls")
+        variables = [intern(self.identifier())]
+        while self.at_literal(","):
+            self.pos += 1
+            variables.append(intern(self.identifier()))
+
+        self.expect_keyword("init")
+        init = self.guarded_commands()
+
+        self.expect_keyword("update")
+        update = self.guarded_commands()
+
+        self.expect_keyword("goal")
+        goal, goal_variables = formula_from_tokens(self.formula(LTL_unary_ops, LTL_binary_ops))
+
+        self.expect_keyword("end module")
+        return Module(name, tuple(variables), init, update, goal, goal_variables)
+
+    def RML_file(self):
+        '''
+        RML_file ::= module+
+        '''
+        modules = [self.module()]
+        while self.at_keyword("module"):
+            modules.append(self.module())
+
+        self.skip()
+        if self.pos != len(self.text):
+            self.error("Expected \"module\"")
+
+        return modules
+
+def parse_RML(file_content):
+    '''
+    Parse the content of a RML file, comments included.
+    Return a list of Module, like convert_result(build_RML_parser().parseString(...)).
+    '''
+    return RMLParser(file_content).RML_file()
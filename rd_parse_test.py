@@ -0,0 +1,55 @@
+import glob
+import pyparsing as pp
+import unittest
+from parse import *
+from game import *
+from rd_parse import *
+
+class TestDifferential(unittest.TestCase):
+    '''
+    Check that parse_RML agrees with the pyparsing grammar.
+    '''
+    parser = get_RML_parser()
+
+    def assertSameResult(self, file_content):
+        try:
+            expected = repr(convert_result(self.parser.parseString(strip_comments(file_content))))
+        except pp.ParseException:
+            self.assertRaises(pp.ParseException, parse_RML, file_content)
+        else:
+            self.assertEqual(expected, repr(parse_RML(file_content)))
+
+    def test_RML_examples(self):
+        paths = sorted(glob.glob("RML_examples/*.rml"))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path, "r") as f:
+                self.assertSameResult(f.read())
+
+    def test_formulae(self):
+        template = """
+module m controls Up, x, Trueabc
+    init
+    [] True ~> x := True, Up := False
+    update
+    [] %s ~> x := %s
+    goal
+    %s
+end module
+"""
+        cases = [
+            ("x", "!x", "GFx"),
+            ("(x && !Up) || Trueabc", "x -> Up -> !(x || Trueabc)", "F(x->GUp)||((!x)UUp)"),
+            ("!!x&&Up", "((x))", "XTrue U x"),
+            ("x->(Up)", "False", "G(x U (Up U Trueabc))"),
+        ]
+        for condition, assignment, goal in cases:
+            self.assertSameResult(template % (condition, assignment, goal))
+
+    def test_errors(self):
+        self.assertRaises(pp.ParseException, parse_RML, "module m controls x init [] True ~> x := True end module")
+        self.assertRaises(pp.ParseException, parse_RML, "module m controls True")
+        self.assertRaises(pp.ParseException, parse_RML, "module m controls x init [] True ~> x := (x update [] x ~> x := x goal x end module")
+
+if __name__ == "__main__":
+    unittest.main()
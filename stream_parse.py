@@ -0,0 +1,144 @@
+'''
+This module parses a RML file one module at a time.
+The file is read line by line and split after each "end module", so only the
+text of the current module and the Module objects parsed so far are in memory,
+instead of the whole file and its complete parse tree.
+Since the modules are parsed independently of each other, they can also be
+parsed in a pool of processes, see iter_modules.
+'''
+import collections
+import itertools
+import re
+import multiprocessing
+from pyparsing import ParseException
+from parse import *
+from game import *
+from rd_parse import *
+
+# The end of a module, as matched by pyparsing.Keyword("end module")
+end_module_pattern = re.compile(r"(?<![a-zA-Z0-9_$])end module(?![a-zA-Z0-9_$])")
+
+def iter_module_sources(f):
+    '''
+    Read the RML file object f line by line, with comments removed.
+    Yield a (line number, text) tuple for each module, where line number is
+    the line of the file on which text starts.
+    '''
+    buffer = ""
+    start_line = 1
+    search_pos = 0
+    for line in f:
+        buffer += strip_comments(line)
+
+        while True:
+            m = end_module_pattern.search(buffer, search_pos)
+            if m is None:
+                # "end module" may still be completed by the next line
+                search_pos = max(0, len(buffer) - len("end module"))
+                break
+
+            source = buffer[:m.end()]
+            yield start_line, source
+
+            start_line += source.count("\n")
+            buffer = buffer[m.end():]
+            search_pos = 0
+
+    if buffer.strip():
+        # text after the last module, which is reported as an error by the parser
+        yield start_line, buffer
+
+def parse_module_source(start_line, source, parser="pyparsing"):
+    '''
+    Parse the text of a single module, starting at line start_line of the file.
+    parser: "pyparsing" or "rd"
+    Return a Module.
+    '''
+    try:
+        if parser == "rd":
+            rd_parser = RMLParser(source)
+            m = rd_parser.module()
+            rd_parser.skip()
+            if rd_parser.pos != len(source):
+                rd_parser.error("Expected end of module")
+            return m
+        else:
+            return convert_module(get_module_parser().parseString(source, parseAll=True))
+    except ParseException as e:
+        raise ParseException(e.pstr, e.loc, e.msg + " (at line " + str(start_line + e.lineno - 1) + " of the file)")
+
+# The number of modules sent to a worker process at a time
+DEFAULT_PARALLEL_CHUNK_SIZE = 8
+
+class ModuleSourceParser(object):
+    '''
+    Parse a list of (line number, text) tuples with parse_module_source in a
+    worker process, and return the list of Module.
+    A class instead of a closure, so that multiprocessing can pickle it.
+    '''
+    def __init__(self, parser):
+        self.parser = parser
+
+    def __call__(self, module_sources):
+        return [parse_module_source(start_line, source, self.parser) for start_line, source in module_sources]
+
+def iter_modules(f, parser="pyparsing", jobs=1, chunk_size=DEFAULT_PARALLEL_CHUNK_SIZE):
+    '''
+    Yield the Module objects of the RML file object f, one at a time.
+    jobs: the number of processes parsing modules; with more than one, the
+        modules are sent chunk_size at a time to a multiprocessing.Pool and
+        are still yielded in file order. The file is only read ahead by
+        2 * jobs chunks, so that the text of every module is not in memory at
+        once, as it would be with Pool.imap.
+    Raise ParseException if the file has no module, as parsing the whole
+    file does.
+    '''
+    empty = True
+    for m in iter_parsed_modules(f, parser, jobs, chunk_size):
+        empty = False
+        yield m
+
+    if empty:
+        raise ParseException("", 0, "Expected \"module\" (the file has no module)")
+
+def iter_parsed_modules(f, parser, jobs, chunk_size):
+    '''
+    Yield the Module objects of the RML file object f, see iter_modules.
+    '''
+    if jobs <= 1:
+        for start_line, source in iter_module_sources(f):
+            yield parse_module_source(start_line, source, parser)
+        return
+
+    sources = iter_module_sources(f)
+    parse_chunk = ModuleSourceParser(parser)
+    pending = collections.deque() # the results of the chunks sent, in file order
+    pool = multiprocessing.Pool(jobs)
+    try:
+        while True:
+            while len(pending) < 2 * jobs:
+                chunk = list(itertools.islice(sources, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.apply_async(parse_chunk, (chunk,)))
+            if not pending:
+                break
+            for m in pending.popleft().get():
+                yield intern_module(m)
+        pool.close()
+    finally:
+        # stop the workers as well when parsing fails or the caller stops early
+        pool.terminate()
+        pool.join()
+
+def iter_verified_modules(f, ctx, parser="pyparsing", jobs=1):
+    '''
+    Yield the Module objects of the RML file object f, one at a time, verifying
+    each one as it arrives with the VerificationContext ctx. The checks that
+    need later modules are done when the last module has been yielded.
+    '''
+    for m in iter_modules(f, parser, jobs):
+        ctx.add_module(m)
+        yield m
+
+    ctx.finish()
@@ -0,0 +1,97 @@
+import StringIO
+import pyparsing as pp
+import unittest
+from parse import *
+from game import *
+from verify import *
+from stream_parse import *
+
+class TestStreamParse(unittest.TestCase):
+    example = """# two modules, the first one refers to the second one
+module m0 controls u0
+    init
+    [] True ~> u0 := True
+    update
+    [] u1 ~> u0 := !u0 # comment mentioning end module
+    goal
+    GF(u0 && u1)
+end module module m1 controls u1
+    init
+    [] True ~> u1 := False
+    update
+    [] u0 ~> u1 := u0
+    goal
+    GFu1
+end module
+"""
+
+    def test_module_sources(self):
+        sources = list(iter_module_sources(StringIO.StringIO(self.example)))
+        self.assertEqual(2, len(sources))
+        self.assertEqual(1, sources[0][0])
+        self.assertEqual(9, sources[1][0])
+        self.assertTrue(sources[0][1].endswith("end module"))
+        self.assertTrue(sources[1][1].lstrip().startswith("module m1"))
+
+    def test_same_as_whole_file(self):
+        expected = repr(convert_result(get_RML_parser().parseString(strip_comments(self.example))))
+        for parser in ["pyparsing", "rd"]:
+            modules = list(iter_modules(StringIO.StringIO(self.example), parser))
+            self.assertEqual(expected, repr(modules))
+
+    def test_parallel(self):
+        expected = repr(list(iter_modules(StringIO.StringIO(self.example * 10), "rd")))
+        for parser in ["pyparsing", "rd"]:
+            modules = list(iter_modules(StringIO.StringIO(self.example * 10), parser, 3, 2))
+            self.assertEqual(expected, repr(modules))
+            # names are interned again after coming back from the workers
+            self.assertIs(modules[0].variables[0], modules[2].variables[0])
+            self.assertIs(modules[0].variables[0], modules[1].update[0].actions[0].variables[0])
+
+    def test_no_module(self):
+        for text in ["", "# only a comment\n"]:
+            for parser in ["pyparsing", "rd"]:
+                for jobs in [1, 2]:
+                    self.assertRaises(pp.ParseException, list, iter_modules(StringIO.StringIO(text), parser, jobs))
+
+    def test_parallel_read_ahead(self):
+        lines = StringIO.StringIO(self.example * 50).readlines()
+        read = []
+        def read_lines():
+            for line in lines:
+                read.append(line)
+                yield line
+
+        modules = iter_modules(read_lines(), "rd", 2, 3)
+        next(modules)
+        # 2 * jobs chunks of 3 modules, and the line after them
+        self.assertLessEqual(len(read), 12 * len(lines) / 100 + 1)
+        self.assertEqual(99, len(list(modules)))
+
+    def test_verify_forward_references(self):
+        ctx = VerificationContext()
+        modules = list(iter_verified_modules(StringIO.StringIO(self.example), ctx))
+        self.assertEqual(2, len(modules))
+        self.assertEqual(("m1", 1), ctx.symbols["u1"])
+
+        undefined = self.example.replace("GFu1", "GFu2")
+        ctx = VerificationContext()
+        self.assertRaises(pp.ParseException, list, iter_verified_modules(StringIO.StringIO(undefined), ctx))
+
+    def test_error_line(self):
+        broken = self.example.replace("    [] u0 ~> u1 := u0\n", "    [] u0 ~> u1 = u0\n")
+        for parser in ["pyparsing", "rd"]:
+            try:
+                list(iter_modules(StringIO.StringIO(broken), parser))
+                self.fail("ParseException not raised")
+            except pp.ParseException as e:
+                self.assertIn("at line 13 of the file", e.msg)
+
+            try:
+                list(iter_modules(StringIO.StringIO(self.example + broken), parser, 2, 1))
+                self.fail("ParseException not raised")
+            except pp.ParseException as e:
+                self.assertIn("at line 29 of the file", e.msg)
+
+if __name__ == "__main__":
+    unittest.main()
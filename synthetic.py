@@ -0,0 +1,164 @@
+'''
+This module generates families of RML games of any size, in the styles of
+the games in RML_examples, for benchmarking how the tool scales:
+    casino: a casino and N players guessing its coin;
+    peer_to_peer: a ring of N peers, each wanting to download while the next one uploads;
+    bisimilarity: N players choosing a bit and a referee stepping through states.
+Each family takes the number of players, the number of update commands and
+of extra controlled variables per module, and the nesting depth of the
+temporal operators around each goal. The games are valid for verify_result.
+'''
+
+FAMILIES = ["casino", "peer_to_peer", "bisimilarity"]
+
+def module_text(name, variables, init, update, goal):
+    '''
+    Return the text of a module.
+    init, update: lists of (condition, [(variable, formula), ...]) pairs
+    '''
+    def commands(gcs):
+        return "".join("    [] {} ~> {}\n".format(condition, ", ".join(v + " := " + f for v, f in actions))
+                       for condition, actions in gcs)
+
+    return "module {} controls {}\n".format(name, ", ".join(variables)) + \
+           "    init\n" + commands(init) + \
+           "    update\n" + commands(update) + \
+           "    goal\n" + \
+           "    " + goal + "\n" + \
+           "end module\n"
+
+def nest_goal(goal, depth):
+    '''
+    Put goal under depth alternating G and F operators.
+    '''
+    for i in range(depth):
+        goal = ("G" if i % 2 == 0 else "F") + "(" + goal + ")"
+    return goal
+
+def free_commands(condition, variables, commands):
+    '''
+    Return commands guarded commands with the given condition, the j-th of
+    which sets the i-th variable to bit i of j. When there are more commands
+    than values, the others negate or keep each variable, under guards told
+    apart by distinct_guard, so that up to 2 ** n + 6 ** n commands differ
+    for n variables.
+    '''
+    gcs = []
+    for j in range(commands):
+        if j < 2 ** len(variables):
+            gcs.append((condition, [(v, "True" if (j >> i) & 1 else "False") for i, v in enumerate(variables)]))
+        else:
+            k, guard = divmod(j - 2 ** len(variables), 3 ** len(variables))
+            gcs.append((distinct_guard(condition, variables, guard),
+                        [(v, "!" + v if (k >> i) & 1 == 0 else v) for i, v in enumerate(variables)]))
+    return gcs
+
+def distinct_guard(condition, variables, j):
+    '''
+    Return condition conjoined with the j-th combination of the variables,
+    where each variable is left out, required or negated according to digit
+    i of j in base 3, so that different j < 3 ** len(variables) give
+    different guards.
+    '''
+    literals = []
+    for v in variables:
+        j, digit = divmod(j, 3)
+        if digit == 1:
+            literals.append(v)
+        elif digit == 2:
+            literals.append("!" + v)
+    if not literals:
+        return condition
+    return "(" + condition + " && " + " && ".join(literals) + ")"
+
+def extra_variables(prefix, count):
+    return [prefix + "_x" + str(k) for k in range(count)]
+
+def casino_game(players, commands=2, variables=0, goal_depth=2):
+    '''
+    The casino of casino.rml, with players players each guessing its coin.
+    The casino always has at least 3 update commands. The ones giving the
+    turn back are told apart by guards on the coins, and by what they assign
+    to the extra variables when the guards run out.
+    '''
+    casino_variables = ["turn", "coin_c"] + extra_variables("c", variables)
+    coins = ["coin_c"] + ["coin_p" + str(i) for i in range(players)]
+    casino_update = [("turn", [("coin_c", "True"), ("turn", "False")]),
+                     ("turn", [("coin_c", "False"), ("turn", "False")])]
+    for j in range(max(1, commands - 2)):
+        k, guard = divmod(j, 3 ** len(coins))
+        casino_update.append((distinct_guard("! turn", coins, guard),
+                              [("turn", "True")] + [(v, "!" + v if (k >> i) & 1 == 0 else v)
+                                                    for i, v in enumerate(casino_variables[2:])]))
+    guesses = " && ".join("((coin_c -> Xcoin_p{0}) && (Xcoin_p{0} -> coin_c))".format(i) for i in range(players))
+    text = module_text("Casino", casino_variables,
+                       [("True", [(v, "True" if v == "turn" else "False") for v in casino_variables]),
+                        ("True", [(v, "True") for v in casino_variables])],
+                       casino_update,
+                       nest_goal("!turn -> !(" + guesses + ")", goal_depth))
+
+    for i in range(players):
+        player_variables = ["coin_p" + str(i)] + extra_variables("p" + str(i), variables)
+        guess = "(coin_c -> Xcoin_p{0}) && (Xcoin_p{0} -> coin_c)".format(i)
+        text += "\n" + module_text("Player" + str(i), player_variables,
+                                   free_commands("True", player_variables, 2),
+                                   free_commands("! turn", player_variables, commands),
+                                   nest_goal("!turn -> (" + guess + ")", goal_depth))
+    return text
+
+def peer_to_peer_game(players, commands=2, variables=0, goal_depth=2):
+    '''
+    The ring of peer_to_peer_communication.rml with players peers.
+    '''
+    text = ""
+    for i in range(players):
+        peer_variables = ["u" + str(i), "d" + str(i)] + extra_variables("m" + str(i), variables)
+        goal = "d{} && u{}".format(i, (i + 1) % players)
+        text += "\n" + module_text("m" + str(i), peer_variables,
+                                   free_commands("True", peer_variables, 2),
+                                   free_commands("True", peer_variables, commands),
+                                   nest_goal(goal, goal_depth))
+    return text
+
+def bisimilarity_game(players, commands=2, variables=0, goal_depth=2):
+    '''
+    Players choosing a bit each round, and a referee moving to an accepting
+    state when all of them choose True, as in bisimilarity_true.rml.
+    '''
+    choices = ["a" + str(i) for i in range(players)]
+    text = ""
+    for i, a in enumerate(choices):
+        player_variables = [a] + extra_variables("b" + str(i), variables)
+        text += "\n" + module_text("m" + str(i), player_variables,
+                                   free_commands("True", player_variables, 2),
+                                   free_commands("True", player_variables, commands),
+                                   nest_goal("X X " + ("p" if i % 2 else "!p"), goal_depth))
+
+    referee_variables = ["p", "s0", "s1"] + extra_variables("r", variables)
+    all_true = " && ".join(choices)
+    referee_update = [("(s0 && " + all_true + ")", [("s1", "True"), ("s0", "False")]),
+                      ("(s0 && !(" + all_true + "))", [("p", "True"), ("s0", "False")]),
+                      ("(s1 || !s0)", [("p", "!p")] + [(v, "!" + v) for v in referee_variables[3:]])]
+    for j in range(max(0, commands - 3)):
+        k, guard = divmod(j, 3 ** players - 1)
+        referee_update.append((distinct_guard("s1", choices, guard + 1),
+                               [("p", "False")] + [(v, "!" + v if (k >> i) & 1 == 0 else v)
+                                                   for i, v in enumerate(referee_variables[3:])]))
+    text += "\n" + module_text("referee", referee_variables,
+                               [("True", [(v, "True" if v == "s0" else "False") for v in referee_variables])],
+                               referee_update,
+                               nest_goal("p || s1", goal_depth))
+    return text
+
+def synthetic_game(family, players, commands=2, variables=0, goal_depth=2):
+    '''
+    Return the text of a game of the given family, see FAMILIES.
+    '''
+    if family == "casino":
+        return casino_game(players, commands, variables, goal_depth)
+    elif family == "peer_to_peer":
+        return peer_to_peer_game(players, commands, variables, goal_depth)
+    elif family == "bisimilarity":
+        return bisimilarity_game(players, commands, variables, goal_depth)
+    else:
+        raise ValueError("Unknown family of games: " + family)
@@ -0,0 +1,36 @@
+import unittest
+from parse import *
+from game import *
+from verify import *
+from rd_parse import *
+from synthetic import *
+
+class TestSyntheticGames(unittest.TestCase):
+    def test_valid(self):
+        parser = get_RML_parser()
+        for family in FAMILIES:
+            for players, commands, variables, goal_depth in [(1, 1, 0, 0), (3, 2, 1, 2), (4, 5, 2, 3)]:
+                rml_text = synthetic_game(family, players, commands, variables, goal_depth)
+                result = parse_RML(rml_text)
+                self.assertEqual(repr(convert_result(parser.parseString(rml_text))), repr(result))
+                verify_result(result)
+
+    def test_sizes(self):
+        result = parse_RML(synthetic_game("peer_to_peer", 5, 3, 2, 1))
+        self.assertEqual(5, len(result))
+        for m in result:
+            self.assertEqual(4, len(m.variables))
+            self.assertEqual(3, len(m.update))
+            self.assertEqual("G", m.goal.op)
+
+        # the commands of each module differ from each other
+        for family in FAMILIES:
+            for players, commands, variables in [(1, 10, 2), (3, 8, 1), (2, 10, 2), (4, 5, 0)]:
+                for m in parse_RML(synthetic_game(family, players, commands, variables, 1)):
+                    self.assertEqual(len(m.update), len(set(repr(gc) for gc in m.update)), (family, m.name))
+                    self.assertEqual(len(m.init), len(set(repr(gc) for gc in m.init)), (family, m.name))
+
+        self.assertRaises(ValueError, synthetic_game, "chess", 2)
+
+if __name__ == "__main__":
+    unittest.main()
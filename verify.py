@@ -3,98 +3,153 @@ Verify a parsed result is valid.
 If a module is not valid, raise exception.
 '''
 from pyparsing import ParseException
+from formula import Constant
 
-module_name_set = set([]) # store all module names
-controlled_variable_set = set([]) # store all controlled variables
+class VerificationContext(object):
+    '''
+    Hold all the state of verifying one game, so that many games can be
+    verified in one process, or in parallel threads, without affecting each other.
+    '''
+    def __init__(self):
+        self.module_name_set = set([]) # store all module names
+        self.symbols = {} # the symbol table of all controlled variables
+        self.module_count = 0 # the number of modules added by add_module
+        self.pending = [] # (variable, message) of references to variables not defined yet
+
+    def add_module(self, m):
+        '''
+        Verify one more module of a game whose modules arrive one at a time.
+        References to variables of modules that have not arrived yet are kept
+        until finish() is called.
+        '''
+        add_module_symbols(self.symbols, m, self.module_count)
+        self.module_count += 1
+        verify_module(m, self)
+
+    def finish(self):
+        '''
+        Check the references kept by add_module, once all modules have arrived.
+        Return the symbol table of all controlled variables.
+        '''
+        for v, message in self.pending:
+            if v not in self.symbols:
+                raise ParseException(message)
+
+        self.pending = []
+        return self.symbols
+
+    def check_defined(self, v, message):
+        '''
+        Raise exception with message if v is not a controlled variable. While
+        modules are being added one at a time, the check is left to finish().
+        '''
+        if v not in self.symbols:
+            if self.module_count:
+                self.pending.append((v, message))
+            else:
+                raise ParseException(message)
+
+def build_symbol_table(r):
+    '''
+    r: a list of Module
+    Return a dict mapping each controlled variable to a (module name, module index) tuple.
+    Raise exception if a variable is controlled by more than one module.
+    '''
+    symbols = {}
+    for idx, m in enumerate(r):
+        add_module_symbols(symbols, m, idx)
+
+    return symbols
 
-def verify_result(r):
+def add_module_symbols(symbols, m, idx):
     '''
-    r: a list of parsed module results
+    Add the controlled variables of m, the idx-th module, to the symbol table.
     '''
+    for v in m.variables:
+        if v in symbols:
+            raise ParseException("Having duplicate controlled variable.")
+        else:
+            symbols[v] = (m.name, idx)
+
+def verify_result(r, ctx=None):
+    '''
+    r: a list of Module
+    ctx: a fresh VerificationContext, created here if not given
+    Return the symbol table of all controlled variables, for use by the generator.
+    '''
+    if ctx is None:
+        ctx = VerificationContext()
+
     '''
     2. All controlled variabels are different.
     '''
-    for m in r:
-        for v in m["variable_list"]:
-            if v in controlled_variable_set:
-                raise ParseException("Having duplicate controlled variable.")
-            else:
-                controlled_variable_set.add(v)
+    ctx.symbols = build_symbol_table(r)
 
     for m in r:
-        verify_module(m)
+        verify_module(m, ctx)
 
+    return ctx.symbols
 
-def verify_module(m):
+
+def verify_module(m, ctx):
     '''
     Verify each module separately.
     Check following:
     1. All modules have different names.
     '''
-    if m["name"][0] in module_name_set:
+    if m.name in ctx.module_name_set:
         raise ParseException("Having duplicate module name.")
     else:
-        module_name_set.add(m["name"][0])
-
-    '''
-    2. All controlled variables are different.
-    '''
-    # for v in m["variable_list"]:
-        # if v in controlled_variable_set:
-            # raise ParseExceptino("Having duplicate controlled variable.")
-        # else:
-            # controlled_variable_set.add(v)
+        ctx.module_name_set.add(m.name)
 
     '''
     3. In init part, all "condition part" must be "True".
     '''
-    for gc in m["init"]: # each guarded command in "init" part
-        if gc["condition_part"][0] != "True":
+    for gc in m.init: # each guarded command in "init" part
+        if not isinstance(gc.condition, Constant) or gc.condition.value != "True":
             raise ParseException("Having init guarded command with condition other than 'True'.")
 
     '''
     4. For each guarded command, the assigned variables in lhs of command actions must be within its own controllable variables.
     '''
-    for gc in m["init"]:
-        for action in gc["action_part"]:
-            if action["assigned_variable"][0] not in m["variable_list"].asList():
-                v = action["assigned_variable"][0]
+    module_variables = set(m.variables)
+
+    for gc in m.init:
+        for action in gc.actions:
+            if action.variable not in module_variables:
+                v = action.variable
                 raise ParseException("Having a uncontrollable variable: " + v + ", in lhs of an assignment.")
 
-    for gc in m["update"]:
-        for action in gc["action_part"]:
-            if action["assigned_variable"][0] not in m["variable_list"].asList():
-                v = action["assigned_variable"][0]
+    for gc in m.update:
+        for action in gc.actions:
+            if action.variable not in module_variables:
+                v = action.variable
                 raise ParseException("Having a uncontrollable variable: " + v + ", in lhs of an assignment.")
 
     '''
     5. For each guarded command, all the variables appeared in assignment must be within all controlled variables.
     '''
-    for gc in m["init"]:
-        for a in gc["action_part"]:
-            for v in a["assignment_variables"]:
-                if v not in controlled_variable_set:
-                    raise ParseException("Having an atom in rhs of a guarded command assignment, which is not defined.")
+    for gc in m.init:
+        for a in gc.actions:
+            for v in a.variables:
+                ctx.check_defined(v, "Having an atom in rhs of a guarded command assignment, which is not defined.")
 
-    for gc in m["update"]:
-        for a in gc["action_part"]:
-            for v in a["assignment_variables"]:
-                if v not in controlled_variable_set:
-                    raise ParseException("Having an atom in rhs of a gaurded command assignment, which is not defined.")
+    for gc in m.update:
+        for a in gc.actions:
+            for v in a.variables:
+                ctx.check_defined(v, "Having an atom in rhs of a gaurded command assignment, which is not defined.")
 
     '''
     6. For gaurded commmand in 'update' part, all the variables appeared in condition part must be within all controlled variables.
     '''
-    for i, gc in enumerate(m["update"]):
-        for v in gc["condition_variables"]:
-            if v not in controlled_variable_set:
-                raise ParseException("Having an undefined atom in lhs of a guarded command in a module")
+    for i, gc in enumerate(m.update):
+        for v in gc.condition_variables:
+            ctx.check_defined(v, "Having an undefined atom in lhs of a guarded command in a module")
 
     '''
     7. For the 'goal' part, each variable in the 'variables' must be within all controlled variables.
     '''
-    if "goal" in m:
-        for v in m["goal"]["variables"]:
-            if v not in controlled_variable_set:
-                raise ParseException("Having an undefiend atom in the goal part of a module")
+    if m.goal is not None:
+        for v in m.goal_variables:
+            ctx.check_defined(v, "Having an undefiend atom in the goal part of a module")
 